@@ -1,12 +1,26 @@
-from flask import Flask, request, jsonify
-from astropy.constants import M_sun, L_sun
-import joblib
-import pandas as pd
-import math
+from flask import Flask, Response, g, request
+import metrics
+import service
 
 app = Flask(__name__, static_folder="frontend/dist", static_url_path="/")
+app.config.update(service.config)
 
-model = joblib.load("linear_model.pkl")
+
+def respond(result):
+    status, headers, body = result
+    return Response(body, status=status, headers=headers)
+
+@app.before_request
+def start_timer():
+    g.timer = metrics.RequestTimer(request.url_rule.rule if request.url_rule else "unmatched", request.method)
+
+@app.after_request
+def record_metrics(response):
+    timer = g.pop("timer", None)
+    if timer is not None:
+        # Streamed bodies have no length up front
+        timer.finish(response.status_code, None if response.is_streamed else response.calculate_content_length())
+    return response
 
 @app.route("/", methods=["GET"])
 @app.route("/predict", methods=["GET"])
@@ -15,52 +29,32 @@ model = joblib.load("linear_model.pkl")
 def index():
     return app.send_static_file("index.html")
 
-def get_star_data():
-    df = pd.read_csv("joined_out.csv")
-    df = df.drop(columns=["met", "Teff", "R", "spectype"])
-    df["M"] = 10**df["M"] / M_sun.value
-    df["L"] = 10**df["L"] / L_sun.value
-
-    label_df = pd.DataFrame({
-        "Name": ["\N{GREEK SMALL LETTER ALPHA} Canis Majoris A",
-                 "\N{GREEK SMALL LETTER ALPHA} Piscis Austrini",
-                 "Sun",
-                 "\N{GREEK SMALL LETTER ALPHA} Centauri C"],
-        "L": [24.7, 16.63, 1,	0.001567],
-        "M": [2.06, 1.92, 1, 0.1221],
-        "Info": ["Also known as Sirius, the brighest star in the night sky",
-                 "Was assumed to host the first exoplanet imaged at visible\nwavelengths; it later turned out to be a dust cloud",
-                 "Centerpiece of our Solar System",
-                 "Our closest extrasolar neighbor"]
-    })
-    return df, label_df
-
 @app.route("/predict", methods=["POST"])
 def predict():
-    data = request.get_json()
-    luminosity = data.get("luminosity")
-    metallicity = data.get("metallicity")
-    if luminosity is None or metallicity is None:
-        return jsonify({"error": "Missing parameters"}), 400
-    # The model expects the luminosity in log watts
-    log_watts = 26.583 + math.log10(luminosity)
+    with metrics.stage("parse_json"):
+        data = request.get_json(silent=True)
+    return respond(service.predict(data, point_only=request.args.get("catalog") == "0",
+                                   accept=request.headers.get("Accept")))
 
-    X_new = pd.DataFrame([[log_watts, metallicity]], columns=["L", "met"])
-    prediction = model.predict(X_new)
-    prediction = 10**(float(prediction[0])) / M_sun.value
+@app.route("/predict/batch", methods=["POST"])
+def predict_batch():
+    return respond(service.predict_batch(request.get_data(), request.content_type,
+                                         request.headers.get("Accept")))
 
-    df, label_df = get_star_data()
+@app.route("/graph_data/lod", methods=["GET"])
+def get_graph_lod():
+    return respond(service.graph_lod(request.args))
 
-    return jsonify({
-        "stars": df[["M", "L"]].to_dict(orient="records"),
-        "labels": label_df.to_dict(orient="records"),
-        "predicted": {"M": prediction, "L": luminosity }
-        })
+@app.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    return respond(service.cache_stats())
 
 @app.route("/graph_data", methods=["GET"])
 def get_graph():
-    df, label_df = get_star_data()
-    return jsonify({
-        "stars": df[["M", "L"]].to_dict(orient="records"),
-        "labels": label_df.to_dict(orient="records")
-    })
\ No newline at end of file
+    return respond(service.graph_data(request.headers.get("Accept-Encoding"),
+                                      request.headers.get("If-None-Match"),
+                                      request.headers.get("Accept")))
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    return respond(service.metrics_text())
@@ -0,0 +1,109 @@
+""" ASGI variant of app.py, sharing its handlers through service.py.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8080 --workers 4
+
+Requires the extra packages in requirements-asgi.txt. """
+import json
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import FileResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+import metrics
+import service
+
+STATIC_DIR = "frontend/dist"
+ROUTES = {"/", "/predict", "/graphs", "/definitions", "/predict/batch", "/cache/stats", "/graph_data", "/graph_data/lod", "/metrics"}
+
+
+def respond(result):
+    status, headers, body = result
+    if isinstance(body, bytes):
+        return Response(body, status_code=status, headers=headers)
+    # Streamed batch results; Starlette iterates sync generators in its threadpool
+    return StreamingResponse(body, status_code=status, headers=headers)
+
+
+async def index(request):
+    return FileResponse(f"{STATIC_DIR}/index.html")
+
+
+async def predict(request):
+    body = await request.body()
+    try:
+        with metrics.stage("parse_json"):
+            data = json.loads(body)
+    except ValueError:
+        data = None
+    return respond(service.predict(data, point_only=request.query_params.get("catalog") == "0",
+                                   accept=request.headers.get("accept")))
+
+
+async def predict_batch(request):
+    body = await request.body()
+    # Parsing and scoring large uploads is CPU-bound, keep it off the event loop
+    result = await run_in_threadpool(service.predict_batch, body,
+                                     request.headers.get("content-type"), request.headers.get("accept"))
+    return respond(result)
+
+
+async def cache_stats(request):
+    return respond(service.cache_stats())
+
+
+async def graph_lod(request):
+    return respond(service.graph_lod(request.query_params))
+
+
+async def get_metrics(request):
+    return respond(service.metrics_text())
+
+
+async def graph_data(request):
+    return respond(service.graph_data(request.headers.get("accept-encoding"),
+                                      request.headers.get("if-none-match"),
+                                      request.headers.get("accept")))
+
+
+class MetricsMiddleware:
+    """ Pure ASGI middleware feeding the request counters and histograms """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        # cProfile cannot follow a request across awaits, so no profiling here
+        route = scope["path"] if scope["path"] in ROUTES else "static"
+        timer = metrics.RequestTimer(route, scope["method"], profile=False)
+        state = {"status": 500, "bytes": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                state["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            timer.finish(state["status"], state["bytes"])
+
+
+app = Starlette(routes=[
+    Route("/", index, methods=["GET"]),
+    Route("/predict", index, methods=["GET"]),
+    Route("/graphs", index, methods=["GET"]),
+    Route("/definitions", index, methods=["GET"]),
+    Route("/predict", predict, methods=["POST"]),
+    Route("/predict/batch", predict_batch, methods=["POST"]),
+    Route("/cache/stats", cache_stats, methods=["GET"]),
+    Route("/graph_data", graph_data, methods=["GET"]),
+    Route("/graph_data/lod", graph_lod, methods=["GET"]),
+    Route("/metrics", get_metrics, methods=["GET"]),
+    Mount("/", StaticFiles(directory=STATIC_DIR, check_dir=False)),
+])
+app.add_middleware(MetricsMiddleware)
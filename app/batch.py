@@ -0,0 +1,128 @@
+import csv
+import io
+import json
+import numpy as np
+
+
+class BatchError(Exception):
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def _columns(rows: list, max_rows: int):
+    if len(rows) > max_rows:
+        raise BatchError(f"Batch exceeds the limit of {max_rows} rows", 413)
+    try:
+        L = np.array([row["luminosity"] for row in rows], dtype=np.float64)
+        met = np.array([row["metallicity"] for row in rows], dtype=np.float64)
+    except (KeyError, TypeError, ValueError, OverflowError):
+        raise BatchError("Every row needs numeric luminosity and metallicity")
+    return L, met
+
+
+def _from_json(body: bytes, max_rows: int):
+    data = json.loads(body)
+
+    # Either {"luminosity": [...], "metallicity": [...]} or a list of row objects
+    if isinstance(data, dict):
+        L, met = data.get("luminosity"), data.get("metallicity")
+        if not isinstance(L, list) or not isinstance(met, list):
+            raise BatchError("Missing parameters")
+        if len(L) != len(met):
+            raise BatchError("luminosity and metallicity must have the same length")
+        if len(L) > max_rows:
+            raise BatchError(f"Batch exceeds the limit of {max_rows} rows", 413)
+        try:
+            return np.array(L, dtype=np.float64), np.array(met, dtype=np.float64)
+        except (TypeError, ValueError, OverflowError):
+            raise BatchError("luminosity and metallicity must be numeric")
+    if isinstance(data, list):
+        return _columns(data, max_rows)
+    raise BatchError("Missing parameters")
+
+
+def _from_ndjson(body: bytes, max_rows: int):
+    rows = []
+    for line in body.splitlines():
+        if line.strip():
+            rows.append(json.loads(line))
+            if len(rows) > max_rows:
+                break
+    return _columns(rows, max_rows)
+
+
+def _from_csv(body: bytes, max_rows: int):
+    reader = csv.DictReader(io.StringIO(body.decode("utf-8")))
+    if not reader.fieldnames or not {"luminosity", "metallicity"} <= set(reader.fieldnames):
+        raise BatchError("CSV header must contain luminosity and metallicity")
+    rows = []
+    for row in reader:
+        rows.append(row)
+        if len(rows) > max_rows:
+            break
+    return _columns(rows, max_rows)
+
+
+def parse_batch(body: bytes, content_type: str, max_rows: int):
+    """ Parses a batch upload into (luminosity, metallicity) float64 arrays """
+    mimetype = (content_type or "application/json").split(";")[0].strip().lower()
+    try:
+        if mimetype in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+            L, met = _from_ndjson(body, max_rows)
+        elif mimetype in ("text/csv", "application/csv"):
+            L, met = _from_csv(body, max_rows)
+        else:
+            L, met = _from_json(body, max_rows)
+    except (UnicodeDecodeError, json.JSONDecodeError, csv.Error):
+        raise BatchError(f"Could not parse {mimetype} body")
+
+    # Nested lists parse into 2-D arrays whose rows would each be scored as one star
+    if L.ndim != 1 or met.ndim != 1:
+        raise BatchError("luminosity and metallicity must be numbers, one per row")
+    if not L.size:
+        raise BatchError("Empty batch")
+    bad = np.flatnonzero(~(np.isfinite(L) & (L > 0) & np.isfinite(met)))
+    if bad.size:
+        raise BatchError(f"Invalid values in row {int(bad[0])}: luminosity must be positive and all values finite")
+    return L, met
+
+
+def render_batch(L: np.ndarray, M: np.ndarray, fmt: str, chunk_rows: int,
+                 M_low: np.ndarray | None = None, M_high: np.ndarray | None = None):
+    """ Yields the response body in chunks of at most chunk_rows rows.
+
+    fmt is one of "json", "ndjson" or "csv". With M_low and M_high every
+    row also carries the bounds of its prediction interval. """
+    n = L.size
+    bounds = M_low is not None
+    if fmt == "csv":
+        yield "L,M,M_low,M_high\n" if bounds else "L,M\n"
+    elif fmt == "json":
+        yield '{"predicted":['
+
+    for start in range(0, n, chunk_rows):
+        L_chunk = L[start:start + chunk_rows].tolist()
+        M_chunk = M[start:start + chunk_rows].tolist()
+        if bounds:
+            rows = zip(L_chunk, M_chunk, M_low[start:start + chunk_rows].tolist(),
+                       M_high[start:start + chunk_rows].tolist())
+            if fmt == "csv":
+                yield "".join(f"{l!r},{m!r},{lo!r},{hi!r}\n" for l, m, lo, hi in rows)
+            elif fmt == "ndjson":
+                yield "".join(f'{{"M":{m!r},"M_low":{lo!r},"M_high":{hi!r},"L":{l!r}}}\n' for l, m, lo, hi in rows)
+            else:
+                sep = "," if start else ""
+                yield sep + ",".join(f'{{"M":{m!r},"M_low":{lo!r},"M_high":{hi!r},"L":{l!r}}}'
+                                     for l, m, lo, hi in rows)
+        elif fmt == "csv":
+            yield "".join(f"{l!r},{m!r}\n" for l, m in zip(L_chunk, M_chunk))
+        elif fmt == "ndjson":
+            yield "".join(f'{{"M":{m!r},"L":{l!r}}}\n' for l, m in zip(L_chunk, M_chunk))
+        else:
+            sep = "," if start else ""
+            yield sep + ",".join(f'{{"M":{m!r},"L":{l!r}}}' for l, m in zip(L_chunk, M_chunk))
+
+    if fmt == "json":
+        yield "]}"
@@ -0,0 +1,97 @@
+""" Catalog load benchmark: CSV vs Parquet vs memory-mapped Arrow.
+
+Run from the app directory:
+
+    python bench/catalog_load.py --rows 1000000
+
+(pyarrow is needed for the Parquet and Arrow formats: pip install -r
+requirements-arrow.txt.)
+
+Writes a synthetic catalog with the joined_out schema in each format, then
+loads it in a fresh process per format and run. Reports the time of
+read_log_columns (the format-dependent part) and of a full CatalogStore
+load (which also serializes the star JSON), each with the resident memory
+the process gained (Linux /proc/self/statm; mapped file pages count).
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+import numpy as np
+from startup import APP_DIR
+
+FORMATS = ["csv", "parquet", "arrow"]
+
+CHILD = """
+import json, os, sys, time
+import numpy as np
+import pyarrow.feather, pyarrow.parquet
+from catalog import CatalogStore, read_log_columns
+
+def rss_kb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+path, full = sys.argv[1], sys.argv[2] == "1"
+base = rss_kb()
+start = time.perf_counter()
+if full:
+    CatalogStore(path).refresh()
+else:
+    M, L = read_log_columns(path)
+    float(M.sum() + L.sum())     # Touch every page of a memory-mapped file
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "rss_kb": rss_kb() - base}))
+"""
+
+
+def write_catalog(directory: Path, rows: int, seed: int = 0) -> dict[str, Path]:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    rng = np.random.default_rng(seed)
+    table = pa.table({
+        "tic_id": pa.array([f"TIC {n}" for n in rng.integers(10**6, 10**9, rows)]),
+        "gaia_id": pa.array(rng.integers(10**18, 7 * 10**18, rows), pa.int64()),
+        "spectype": pa.array(rng.choice(list("AFGKM"), rows)).dictionary_encode(),
+        "M": rng.normal(30.2, 0.2, rows),
+        "L": rng.normal(26.5, 0.6, rows),
+        "Teff": rng.normal(5500, 800, rows).astype(np.float32),
+        "R": rng.lognormal(0, 0.3, rows).astype(np.float32),
+        "met": rng.normal(-4.5, 0.2, rows),
+    })
+    paths = {fmt: directory / f"joined_out.{fmt}" for fmt in FORMATS}
+    table.to_pandas().to_csv(paths["csv"], index=False)
+    pq.write_table(table, paths["parquet"], compression="zstd")
+    feather.write_feather(table, paths["arrow"], compression="uncompressed", chunksize=rows)
+    return paths
+
+
+def measure(path: Path, full: bool) -> dict:
+    result = subprocess.run([sys.executable, "-c", CHILD, str(path), "1" if full else "0"],
+                            cwd=APP_DIR, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_catalog(Path(tmp), args.rows)
+        print(f"{args.rows} rows")
+        print(f"{'format':<8} {'size MB':>8} {'columns ms':>11} {'RSS MB':>7} {'full load ms':>13} {'RSS MB':>7}")
+        for fmt, path in paths.items():
+            columns = [measure(path, full=False) for _ in range(args.runs)]
+            full = [measure(path, full=True) for _ in range(args.runs)]
+            print(f"{fmt:<8} {path.stat().st_size / 1e6:8.1f}"
+                  f" {statistics.median(r['seconds'] for r in columns) * 1e3:11.1f}"
+                  f" {statistics.median(r['rss_kb'] for r in columns) / 1024:7.1f}"
+                  f" {statistics.median(r['seconds'] for r in full) * 1e3:13.1f}"
+                  f" {statistics.median(r['rss_kb'] for r in full) / 1024:7.1f}")
@@ -0,0 +1,121 @@
+""" Load test comparing the sync (gunicorn + Flask) and async (uvicorn +
+Starlette) serving modes on the local machine.
+
+Run from the app directory:
+
+    python bench/load_test.py --workers 2 --concurrency 32 --duration 15
+
+Each mode is started in its own server process with the same number of
+workers, warmed up, then driven by keep-alive client threads for a fixed
+duration. The client runs in this process, so on small machines it can
+saturate before the server does; compare modes at equal settings. Both
+serve modeling/model.json and the joined_out.arrow catalog, as the image
+does (startup.SHIPPED_ENV).
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from startup import APP_DIR, SHIPPED_ENV, free_port, wait_for
+
+SERVERS = {
+    "sync": lambda port, workers: [sys.executable, "-m", "gunicorn", "-w", str(workers),
+                                   "-b", f"127.0.0.1:{port}", "app:app"],
+    "async": lambda port, workers: [sys.executable, "-m", "uvicorn", "asgi:app", "--workers", str(workers),
+                                    "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+}
+
+
+def make_request(scenario: str, rng: random.Random):
+    """ (method, path, body, headers) for one request of the scenario.
+    Bodies are bytes so http.client sends them in the same segment as the
+    headers; otherwise Nagle and delayed ACKs add ~40 ms per request. """
+    if scenario == "graph" or (scenario == "mix" and rng.random() < 0.5):
+        return "GET", "/graph_data", None, {"Accept-Encoding": "gzip"}
+    body = json.dumps({"luminosity": 10 ** rng.uniform(-2, 1.5),
+                       "metallicity": rng.uniform(-6, -4),
+                       "catalog": scenario == "predict-full"}).encode("utf-8")
+    return "POST", "/predict", body, {"Content-Type": "application/json"}
+
+
+def client(port: int, scenario: str, deadline: float, latencies: list, errors: list, seed: int):
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    while time.perf_counter() < deadline:
+        method, path, body, headers = make_request(scenario, rng)
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(type(e).__name__)
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+
+def run(mode: str, workers: int, concurrency: int, duration: float, warmup: float, scenario: str) -> dict:
+    port = free_port()
+    proc = subprocess.Popen(SERVERS[mode](port, workers), cwd=APP_DIR, env={**os.environ, **SHIPPED_ENV},
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for(f"http://127.0.0.1:{port}/graph_data", time.perf_counter())
+        results = {}
+        for phase, length in (("warmup", warmup), ("measure", duration)):
+            latencies, errors = [], []
+            deadline = time.perf_counter() + length
+            threads = [threading.Thread(target=client, args=(port, scenario, deadline, latencies, errors, i))
+                       for i in range(concurrency)]
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - start
+            results = {"latencies": latencies, "errors": errors, "elapsed": elapsed}
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    latencies = sorted(results["latencies"])
+    n = len(latencies)
+    return {
+        "mode": mode,
+        "requests": n,
+        "errors": len(results["errors"]),
+        "rps": n / results["elapsed"],
+        "p50_ms": statistics.median(latencies) * 1000 if n else float("nan"),
+        "p99_ms": latencies[min(n - 1, int(0.99 * n))] * 1000 if n else float("nan"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=list(SERVERS), default=list(SERVERS))
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--scenario", choices=["graph", "predict", "predict-full", "mix"], default="mix")
+    args = parser.parse_args()
+
+    print(f"{'mode':<6} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for mode in args.modes:
+        r = run(mode, args.workers, args.concurrency, args.duration, args.warmup, args.scenario)
+        print(f"{r['mode']:<6} {r['requests']:>9} {r['errors']:>7} {r['rps']:>9.1f} "
+              f"{r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+""" Inference benchmark: single-segment vs piecewise (per-luminosity-bin)
+models, for single requests and vectorized batches.
+
+Run from the app directory:
+
+    python bench/model_inference.py --segments 4 --rows 1000000
+
+The linear model is LINEAR_BASE, a fixed single-segment artifact, and the
+piecewise one gives each of --segments segments its coefficients and
+interval parameters, so the two must predict the same masses and bounds.
+The bench checks that, and that single-row and batch scoring agree bit for
+bit. It then times predict and predict_interval for one input and for
+--rows inputs on both models and on the shipped modeling/model.json.
+"""
+import argparse
+import json
+import sys
+import timeit
+import numpy as np
+from startup import APP_DIR, SHIPPED_MODEL
+
+sys.path.insert(0, str(APP_DIR))
+from inference import FORMAT, PIECEWISE_FORMAT, model_from_artifact
+
+
+# The single-segment fit on the catalog; the interval parameters are illustrative, in the
+# shape of least_squares.NormalEquations.interval output
+LINEAR_BASE = {
+    "format": FORMAT,
+    "features": ["L", "met"],
+    "intercept": 25.174521503212418,
+    "coef": [0.2050703972457, 0.07281358178588482],
+    "interval": {"level": 0.95, "t": 1.965, "sigma2": 1e-3, "n": 497, "mean": [26.5, -4.5],
+                 "xtx_inv": [[4e-3, 1e-3], [1e-3, 5e-2]]},
+    "units": {"log_L_sun_W": 26.583, "M_sun_kg": 1.988409870698051e+30},
+}
+
+
+def piecewise_artifact(artifact: dict, segments: int) -> dict:
+    # Edges spread over the catalog's luminosity range (log W)
+    edges = np.linspace(25.5, 27.5, segments + 1)[1:-1]
+    interval = artifact["interval"]
+    return {**artifact, "format": PIECEWISE_FORMAT, "segment_by": "L", "edges": edges.tolist(),
+            "intercept": [artifact["intercept"]] * segments, "coef": [artifact["coef"]] * segments,
+            "interval": {"level": interval["level"],
+                         **{key: [value] * segments for key, value in interval.items() if key != "level"}}}
+
+
+def best_time(fn, number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--segments", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    linear = model_from_artifact(LINEAR_BASE)
+    piecewise = model_from_artifact(piecewise_artifact(LINEAR_BASE, args.segments))
+    models = [("linear", linear), (f"{args.segments} segments", piecewise)]
+    if SHIPPED_MODEL.exists():
+        with open(SHIPPED_MODEL) as f:
+            models.append(("shipped", model_from_artifact(json.load(f))))
+
+    rng = np.random.default_rng(0)
+    luminosity = rng.lognormal(0, 1.5, args.rows)
+    metallicity = rng.normal(-4.5, 0.2, args.rows)
+    batch = piecewise.predict(luminosity, metallicity)
+    np.testing.assert_allclose(batch, linear.predict(luminosity, metallicity), rtol=1e-12)
+    single = np.array([piecewise.predict(l, m)[0] for l, m in zip(luminosity[:10_000], metallicity[:10_000])])
+    np.testing.assert_array_equal(single, batch[:10_000])
+    bounds = np.column_stack(piecewise.predict_interval(luminosity, metallicity))
+    np.testing.assert_array_equal(bounds[:, 0], batch)
+    np.testing.assert_allclose(bounds, np.column_stack(linear.predict_interval(luminosity, metallicity)), rtol=1e-12)
+    single = np.array([np.ravel(piecewise.predict_interval(l, m))
+                       for l, m in zip(luminosity[:10_000], metallicity[:10_000])])
+    np.testing.assert_array_equal(single, bounds[:10_000])
+    print("identical predictions and intervals, single and batch")
+
+    print(f"{'model':<20} {'method':<18} {'single us':>10} {f'{args.rows} rows ms':>16}")
+    for name, model in models:
+        for method in ("predict", "predict_interval") if model.interval is not None else ("predict",):
+            fn = getattr(model, method)
+            one = best_time(lambda: fn(1.2, -4.5), 20_000)
+            many = best_time(lambda: fn(luminosity, metallicity), 5)
+            print(f"{name:<20} {method:<18} {one * 1e6:10.2f} {many * 1e3:16.1f}")
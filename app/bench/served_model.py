@@ -0,0 +1,88 @@
+""" Check that the app serves prediction intervals from the shipped model.
+
+Run from the app directory:
+
+    python bench/served_model.py
+
+Lays out a temporary directory like the Docker image: modeling/model.json
+and the pipeline's joined_out.arrow catalog, with CATALOG_PATH pointing at
+it. The app is booted there twice, once from model.json (FAST_BOOT=0) and
+once from the snapshot that `python snapshot.py` builds in the image.
+Each boot requests /predict and /predict/batch (JSON, ndjson and CSV)
+through Flask's test client. Every response must carry X-Interval-Level
+and M_low < M < M_high, and /predict must match the batch result for the
+same star. Exits non-zero on the first failure.
+"""
+import csv
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from startup import APP_DIR, SHIPPED_CATALOG, SHIPPED_MODEL
+
+STARS = {"luminosity": [0.05, 1.0, 1.2, 40.0], "metallicity": [-4.6, -4.5, -4.4, -4.3]}
+
+
+def check_bounds(rows: list[dict]) -> None:
+    for row in rows:
+        assert row["M_low"] < row["M"] < row["M_high"], row
+
+
+def serve_checks() -> None:
+    # Runs inside the image-like directory, with the boot mode set by FAST_BOOT
+    sys.path.insert(0, str(APP_DIR))
+    import service
+    from app import app
+
+    client = app.test_client()
+    level = str(service.model.interval.level)
+
+    single = []
+    for L, met in zip(STARS["luminosity"], STARS["metallicity"]):
+        response = client.post("/predict?catalog=0", json={"luminosity": L, "metallicity": met})
+        assert response.status_code == 200, response.data
+        assert response.headers["X-Interval-Level"] == level, dict(response.headers)
+        single.append(response.get_json()["predicted"])
+    check_bounds(single)
+
+    full = client.post("/predict", json={"luminosity": 1.0, "metallicity": -4.5})
+    assert full.headers["X-Interval-Level"] == level
+    check_bounds([full.get_json()["predicted"]])
+
+    for accept in ("application/json", "application/x-ndjson", "text/csv"):
+        response = client.post("/predict/batch", json=STARS, headers={"Accept": accept})
+        assert response.status_code == 200, response.data
+        assert response.headers["X-Interval-Level"] == level, dict(response.headers)
+        text = response.get_data(as_text=True)
+        if accept == "text/csv":
+            rows = [{k: float(v) for k, v in row.items()} for row in csv.DictReader(io.StringIO(text))]
+        elif accept == "application/x-ndjson":
+            rows = [json.loads(line) for line in text.splitlines()]
+        else:
+            rows = json.loads(text)["predicted"]
+        check_bounds(rows)
+        assert rows == single, (accept, rows, single)
+
+    print(f"{type(service.model).__name__} ({service.model.version}): intervals at level {level} "
+          f"on /predict and /predict/batch")
+
+
+if __name__ == "__main__":
+    if "--serve" in sys.argv:
+        serve_checks()
+        sys.exit()
+
+    with tempfile.TemporaryDirectory() as image:
+        shutil.copy(SHIPPED_MODEL, os.path.join(image, "model.json"))
+        shutil.copy(SHIPPED_CATALOG, os.path.join(image, "joined_out.arrow"))
+        env = {**os.environ, "CATALOG_PATH": "joined_out.arrow"}
+
+        for name, fast_boot in (("model.json", "0"), ("snapshot", "1")):
+            if fast_boot == "1":
+                subprocess.run([sys.executable, str(APP_DIR / "snapshot.py")], cwd=image, env=env, check=True)
+            print(f"Boot from {name}: ", end="", flush=True)
+            subprocess.run([sys.executable, __file__, "--serve"], cwd=image, env={**env, "FAST_BOOT": fast_boot},
+                           check=True)
@@ -0,0 +1,99 @@
+""" Startup profile and time-to-first-response benchmark for the Flask app.
+
+Run from the app directory:
+
+    python bench/startup.py --runs 5
+
+The app serves what the image ships, modeling/model.json and the
+pipeline's joined_out.arrow catalog (SHIPPED_ENV; reading Arrow needs
+pip install -r requirements-arrow.txt), and the snapshot is rebuilt from
+them first. The import report comes from `python -X importtime`; the boot
+benchmark starts gunicorn in a fresh process and polls until the first
+request succeeds, once with FAST_BOOT=0 and once with FAST_BOOT=1.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+SHIPPED_MODEL = APP_DIR.parent / "modeling" / "model.json"
+SHIPPED_CATALOG = APP_DIR.parent / "modeling" / "preprocessor" / "output" / "joined_out.arrow"
+# Points the app at the model and catalog the Docker image serves
+SHIPPED_ENV = {"MODEL_PATH": str(SHIPPED_MODEL), "CATALOG_PATH": str(SHIPPED_CATALOG)}
+
+
+def import_profile(top: int = 20, env: dict | None = None):
+    """ Per-module import times (self and cumulative, in ms) for `import app` """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"],
+                            cwd=APP_DIR, env=env, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us) / 1000, int(self_us) / 1000, name.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url: str, start: float, timeout: float = 60.0) -> float:
+    """ Polls url until it answers; returns seconds elapsed since start """
+    while time.perf_counter() - start < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                response.read()
+                return time.perf_counter() - start
+        except OSError:
+            time.sleep(0.005)
+    raise TimeoutError(f"No response from {url} within {timeout}s")
+
+
+def time_to_first_response(fast_boot: bool, path: str = "/graph_data", timeout: float = 60.0) -> float:
+    port = free_port()
+    env = {**os.environ, **SHIPPED_ENV, "FAST_BOOT": "1" if fast_boot else "0"}
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "gunicorn", "-b", f"127.0.0.1:{port}", "app:app"],
+                            cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        return wait_for(f"http://127.0.0.1:{port}{path}", start, timeout)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--path", default="/graph_data")
+    args = parser.parse_args()
+
+    subprocess.run([sys.executable, "snapshot.py"], cwd=APP_DIR, env={**os.environ, **SHIPPED_ENV}, check=True)
+    for fast_boot in (False, True):
+        env = {**os.environ, **SHIPPED_ENV, "FAST_BOOT": "1" if fast_boot else "0"}
+        print(f"\nSlowest imports (FAST_BOOT={int(fast_boot)}):")
+        print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+        for cumulative, own, name in import_profile(args.top, env):
+            print(f"{cumulative:14.1f} {own:9.1f}  {name}")
+
+    print(f"\nTime to first response on {args.path} ({args.runs} runs):")
+    for fast_boot in (False, True):
+        times = [time_to_first_response(fast_boot, args.path) for _ in range(args.runs)]
+        print(f"FAST_BOOT={int(fast_boot)}: median {statistics.median(times) * 1000:.0f} ms, "
+              f"min {min(times) * 1000:.0f} ms, max {max(times) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
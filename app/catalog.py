@@ -0,0 +1,166 @@
+import csv
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+from constants import M_SUN_KG, L_SUN_W
+from http_cache import compress
+from lod import LODIndex
+import columns
+
+# Reference stars drawn on top of the catalog in the frontend
+LABELS = [
+    {"Name": "\N{GREEK SMALL LETTER ALPHA} Canis Majoris A",
+     "L": 24.7,
+     "M": 2.06,
+     "Info": "Also known as Sirius, the brighest star in the night sky"},
+    {"Name": "\N{GREEK SMALL LETTER ALPHA} Piscis Austrini",
+     "L": 16.63,
+     "M": 1.92,
+     "Info": "Was assumed to host the first exoplanet imaged at visible\nwavelengths; it later turned out to be a dust cloud"},
+    {"Name": "Sun",
+     "L": 1,
+     "M": 1,
+     "Info": "Centerpiece of our Solar System"},
+    {"Name": "\N{GREEK SMALL LETTER ALPHA} Centauri C",
+     "L": 0.001567,
+     "M": 0.1221,
+     "Info": "Our closest extrasolar neighbor"},
+]
+
+
+def dumps(obj) -> bytes:
+    # Same separators as Flask's compact jsonify output
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def read_log_columns(path: str) -> tuple[np.ndarray, np.ndarray]:
+    """ log10 M [kg] and log10 L [W] of every star in a catalog file.
+
+    Arrow IPC files (.arrow, written by the modelling pipeline) are memory-
+    mapped and the columns come out without a copy; Parquet is decoded
+    through a memory map; anything else is parsed as CSV. pyarrow is only
+    needed for the binary formats. """
+    if path.endswith((".arrow", ".parquet")):
+        try:
+            import pyarrow.feather as feather
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError(f"Reading {path} needs pyarrow: pip install -r requirements-arrow.txt") from e
+        read = pq.read_table if path.endswith(".parquet") else feather.read_table
+        table = read(path, columns=["M", "L"], memory_map=True)
+        return (table.column("M").to_numpy().astype(np.float64, copy=False),
+                table.column("L").to_numpy().astype(np.float64, copy=False))
+
+    with open(path, newline="") as f:
+        rows = [(row["M"], row["L"]) for row in csv.DictReader(f)]
+    logs = np.array(rows, dtype=np.float64).reshape(-1, 2)
+    return logs[:, 0], logs[:, 1]
+
+
+class CatalogStore:
+    """ Process-level cache of the star catalog served by /graph_data and /predict.
+
+    The catalog file (CSV, Parquet or Arrow, see read_log_columns) is read
+    once and kept as solar-unit NumPy arrays together with the serialized
+    JSON of the star and label lists. The file mtime is checked on
+    every access so a redeployed catalog is picked up without a restart.
+    Stores built from arrays without a path (from_arrays) are immutable.
+
+    The catalog version is a content hash of the served JSON and doubles as
+    the ETag; gzip/brotli encodings of the payload are built once on first use. """
+
+    def __init__(self, path: str | None = "joined_out.csv"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self.M = None
+        self.L = None
+        self.stars_json = None
+        self.labels_json = dumps(LABELS)
+        self.graph_json = None
+        self.version = None
+        self._encoded = {}
+
+    def _load(self, mtime: float):
+        log_M, log_L = read_log_columns(self.path)
+        M = 10**log_M / M_SUN_KG
+        L = 10**log_L / L_SUN_W
+
+        stars = [{"M": m, "L": l} for m, l in zip(M.tolist(), L.tolist())]
+        self._set(M, L, dumps(stars))
+        self._mtime = mtime
+
+    def _set(self, M: np.ndarray, L: np.ndarray, stars_json: bytes):
+        self.stars_json = stars_json
+        self.graph_json = b'{"stars":' + self.stars_json + b',"labels":' + self.labels_json + b'}'
+        self.version = hashlib.sha256(self.graph_json).hexdigest()[:20]
+        self._encoded = {None: self.graph_json}
+        self._lod = None
+        self._columns = None
+        self.M, self.L = M, L
+
+    @classmethod
+    def from_arrays(cls, M: np.ndarray, L: np.ndarray, stars_json: bytes, path: str | None = None):
+        """ Store holding arrays already read, e.g. from a snapshot. With the
+        path of the file they came from, it refreshes from that file once it
+        changes; without one it never does. """
+        store = cls(path=path)
+        store._set(M, L, stars_json)
+        if path is not None:
+            store._mtime = os.stat(path).st_mtime
+        return store
+
+    def refresh(self):
+        if self.path is None:
+            return self
+        mtime = os.stat(self.path).st_mtime
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._load(mtime)
+        return self
+
+    def graph_payload(self, encoding: str | None = None) -> bytes:
+        """ The /graph_data body, optionally gzip or br encoded """
+        encoded = self.refresh()._encoded
+        if encoding not in encoded:
+            encoded[encoding] = compress(encoded[None], encoding)
+        return encoded[encoding]
+
+    def _column_data(self):
+        if self._columns is None:
+            layout, data = columns.encode_data({"M": self.M, "L": self.L})
+            self._columns = (layout, data, columns.encode_header(self.M.size, layout, {"labels": LABELS}) + data)
+        return self._columns
+
+    def graph_columns(self) -> bytes:
+        """ The /graph_data body in the binary columnar format (float32 M and L) """
+        self.refresh()
+        return self._column_data()[2]
+
+    def predict_columns(self, predicted: dict) -> bytes:
+        self.refresh()
+        layout, data, _ = self._column_data()
+        return columns.encode_header(self.M.size, layout, {"labels": LABELS, "predicted": predicted}) + data
+
+    def lod_index(self) -> LODIndex:
+        """ Level-of-detail index over (M, log10 L), built on first use """
+        self.refresh()
+        if self._lod is None:
+            with self._lock:
+                if self._lod is None:
+                    self._lod = LODIndex(self.M, np.log10(self.L))
+        return self._lod
+
+    def etag(self, variant: str | None = None) -> str:
+        """ Strong ETag of one representation: the version plus the encoding or format """
+        self.refresh()
+        return f'"{self.version}-{variant}"' if variant else f'"{self.version}"'
+
+    def predict_payload(self, predicted: dict) -> bytes:
+        self.refresh()
+        return (b'{"stars":' + self.stars_json
+                + b',"labels":' + self.labels_json
+                + b',"predicted":' + dumps(predicted) + b'}')
@@ -0,0 +1,45 @@
+""" Column-oriented binary encoding of the catalog for typed-array clients.
+
+    MAGIC (8 bytes) | header length (uint32 LE) | JSON header | padding | data
+
+The data section starts on an 8-byte boundary and each column inside it is
+8-byte aligned, so a browser can wrap it without copying:
+
+    new Float32Array(buffer, dataStart + column.offset, column.length)
+
+The header lists rows, columns (name, dtype, offset, length) and a free-form
+"meta" object that carries the small non-numeric parts (labels, the
+predicted point).
+"""
+import json
+import struct
+import numpy as np
+
+MAGIC = b"SMCOLS01"
+MIMETYPE = "application/vnd.stellar-mass.columns"
+ALIGN = 8
+
+
+def encode_data(columns: dict[str, np.ndarray], dtype: str = "<f4"):
+    """ Returns (layout, data) where data holds the aligned column buffers """
+    layout, chunks, offset = [], [], 0
+    for name, values in columns.items():
+        data = np.ascontiguousarray(values, dtype=dtype).tobytes()
+        layout.append({"name": name, "dtype": dtype, "offset": offset, "length": len(values)})
+        padding = -len(data) % ALIGN
+        chunks.append(data + b"\0" * padding)
+        offset += len(data) + padding
+    return layout, b"".join(chunks)
+
+
+def encode_header(rows: int, layout: list, meta: dict) -> bytes:
+    header = json.dumps({"rows": rows, "columns": layout, "meta": meta},
+                        ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    padding = -(len(MAGIC) + 4 + len(header)) % ALIGN
+    return MAGIC + struct.pack("<I", len(header) + padding) + header + b" " * padding
+
+
+def encode(columns: dict[str, np.ndarray], meta: dict, dtype: str = "<f4") -> bytes:
+    layout, data = encode_data(columns, dtype)
+    rows = len(next(iter(columns.values()))) if columns else 0
+    return encode_header(rows, layout, meta) + data
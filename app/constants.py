@@ -0,0 +1,7 @@
+# Baked in so the app does not import astropy.constants at startup.
+# Values are the IAU 2015 nominal solar constants, as astropy reports them.
+M_SUN_KG = 1.988409870698051e30     # astropy.constants.M_sun.value
+L_SUN_W = 3.828e26                  # astropy.constants.L_sun.value
+
+# The model expects the luminosity in log watts: round(log10(L_SUN_W), 3)
+LOG_L_SUN_W = 26.583
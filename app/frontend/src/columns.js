@@ -0,0 +1,34 @@
+// Decoder for the binary columnar catalog format served by the backend
+// (see app/columns.py). Columns are wrapped as typed arrays over the
+// response buffer without copying; this assumes a little-endian host,
+// which every browser we target is.
+export const COLUMNS_MIMETYPE = "application/vnd.stellar-mass.columns"
+
+const MAGIC = "SMCOLS01"
+const TYPED_ARRAYS = { "<f4": Float32Array, "<f8": Float64Array }
+
+export const decodeColumns = (buffer) => {
+    const decoder = new TextDecoder()
+    if (decoder.decode(new Uint8Array(buffer, 0, 8)) !== MAGIC) {
+        throw new Error("Unexpected catalog format")
+    }
+    const headerLength = new DataView(buffer).getUint32(8, true)
+    const header = JSON.parse(decoder.decode(new Uint8Array(buffer, 12, headerLength)))
+    const dataStart = 12 + headerLength
+
+    const columns = {}
+    for (const column of header.columns) {
+        const TypedArray = TYPED_ARRAYS[column.dtype]
+        columns[column.name] = new TypedArray(buffer, dataStart + column.offset, column.length)
+    }
+    return { rows: header.rows, columns, ...header.meta }
+}
+
+export const fetchColumns = async (url, options = {}) => {
+    const response = await fetch(url, {
+        ...options,
+        headers: { ...options.headers, Accept: COLUMNS_MIMETYPE },
+    })
+    if (!response.ok) throw new Error(`Request to ${url} failed`)
+    return decodeColumns(await response.arrayBuffer())
+}
@@ -1,6 +1,7 @@
 import { useEffect, useState } from "react"
 import { Button, TextField, Typography } from "@mui/material"
 import Plot from "react-plotly.js"
+import { fetchColumns } from "../../columns"
 
 const inputStyle = {
     display: 'flex',
@@ -14,6 +15,7 @@ const Predict = () => {
     const [luminosity, setLuminosity] = useState("")
     const [metallicity, setMetallicity] = useState("")
     const [data, setData] = useState(null)
+    const [catalog, setCatalog] = useState(null)
     const [loading, setLoading] = useState(false)
     const [error, setError] = useState(null)
     const [plot, setPlot] = useState(null)
@@ -21,9 +23,8 @@ const Predict = () => {
     useEffect(() => {
         const fetchGraph = async () => {
             try {
-                const response = await fetch("/graph_data");
-                if (!response.ok) throw new Error("Failed to load base data")
-                const d = await response.json()
+                const d = await fetchColumns("/graph_data")
+                setCatalog(d)
                 setData(d)
                 setPlot(true)
             } catch (err) {
@@ -40,7 +41,7 @@ const Predict = () => {
         setData(null)
         setPlot(null)
         try {
-            const response = await fetch("/predict", {
+            const request = {
                 method: "POST",
                 headers: {
                     "Content-Type": "application/json",
@@ -48,11 +49,18 @@ const Predict = () => {
                 body: JSON.stringify({
                     luminosity: parseFloat(luminosity),
                     metallicity: parseFloat(metallicity),
+                    // Reuse the cached /graph_data catalog when we have it
+                    catalog: catalog === null,
                 }),
-            });
-            if (!response.ok) throw new Error("Server error");
-
-            const d = await response.json()
+            }
+            let d
+            if (catalog) {
+                const response = await fetch("/predict", request)
+                if (!response.ok) throw new Error("Server error")
+                d = { ...catalog, predicted: (await response.json()).predicted }
+            } else {
+                d = await fetchColumns("/predict", request)
+            }
             setData(d)
             setPlot(true)
         } catch (err) {
@@ -168,8 +176,8 @@ const Predict = () => {
             <Plot
                 data={[
                     {
-                        x: data.stars.map(s => s.M),
-                        y: data.stars.map(s => s.L),
+                        x: data.columns.M,
+                        y: data.columns.L,
                         mode: "markers",
                         marker: { color: "#d9a638ff", size: 5 },
                         name: "Stars"
@@ -0,0 +1,74 @@
+""" Helpers for conditional requests and precompressed bodies """
+import gzip
+
+try:
+    import brotli
+except ImportError:     # Brotli is optional, gzip is always available
+    brotli = None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=11)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=9, mtime=0)
+    raise ValueError(f"Unsupported encoding {encoding}")
+
+
+def available_encodings() -> list[str]:
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def parse_accept(header: str) -> dict[str, float]:
+    """ Maps each token of an Accept or Accept-Encoding header to its q value """
+    accepted = {}
+    for item in (header or "").split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    return accepted
+
+
+def negotiate_encoding(accept_encoding: str, available: list[str]) -> str | None:
+    """ Picks the first of the available encodings the client accepts (q > 0) """
+    accepted = parse_accept(accept_encoding)
+    for encoding in available:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def negotiate_mimetype(accept: str, offered: list[str], default: str) -> str:
+    """ The offered mimetype with the highest q value, honouring type/* and */* """
+    accepted = parse_accept(accept)
+    if not accepted:
+        return default
+
+    def q(mimetype):
+        major = mimetype.split("/")[0]
+        return accepted.get(mimetype, accepted.get(f"{major}/*", accepted.get("*/*", 0.0)))
+
+    best = max(offered, key=q)      # max keeps the first of equal candidates
+    return best if q(best) > 0 else default
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """ Weak comparison as required for If-None-Match (RFC 9110 13.1.2) """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    def opaque(tag):
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+
+    return any(opaque(tag) == opaque(etag) for tag in if_none_match.split(","))
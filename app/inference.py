@@ -0,0 +1,244 @@
+import bisect
+import hashlib
+import json
+import math
+import numpy as np
+from constants import LOG_L_SUN_W, M_SUN_KG
+
+FORMAT = "stellar-mass-linear/1"
+PIECEWISE_FORMAT = "stellar-mass-piecewise/1"
+
+
+def _version(params) -> str:
+    # Identifies the model in ETags and cache keys; changes with any parameter
+    return hashlib.sha256(json.dumps(params).encode("utf-8")).hexdigest()[:20]
+
+
+class PredictionInterval:
+    """ Half-widths, in log10 kg, of the prediction intervals exported with
+    the model (see modeling/least_squares.py), one parameter set per model
+    segment:
+
+        t * sqrt(sigma2 * (1 + 1/n + dᵀ xtx_inv d)),   d = [L, met] - mean
+
+    t² sigma2, 1 + 1/n and the distinct entries of the symmetric xtx_inv
+    are precomputed, so a row costs about a dozen floating-point ops. """
+
+    def __init__(self, params: dict, segments: int = 1):
+        def per_segment(key, shape=()):
+            return np.asarray(params[key], dtype=np.float64).reshape(segments, *shape)
+
+        mean, xtx_inv = per_segment("mean", (2,)), per_segment("xtx_inv", (2, 2))
+        self.level = float(params["level"])
+        self.scale = per_segment("t")**2 * per_segment("sigma2")
+        self.base = 1 + 1 / per_segment("n")
+        self.mean_L, self.mean_met = np.ascontiguousarray(mean.T)
+        self.inv_LL, self.inv_Lmet2, self.inv_metmet = xtx_inv[:, 0, 0], 2 * xtx_inv[:, 0, 1], xtx_inv[:, 1, 1]
+        self.params = params
+
+        # Plain lists for the scalar path
+        self._terms = [a.tolist() for a in (self.scale, self.base, self.mean_L, self.mean_met,
+                                            self.inv_LL, self.inv_Lmet2, self.inv_metmet)]
+
+    def half_width(self, X: np.ndarray, segment: np.ndarray | None = None) -> np.ndarray:
+        """ Half-width for every row of a (n, 2) design matrix, with the
+        parameters of each row's segment (or of the only one) """
+        if segment is None:
+            scale, base, mean_L, mean_met, inv_LL, inv_Lmet2, inv_metmet = (t[0] for t in self._terms)
+        else:
+            scale, base, mean_L, mean_met, inv_LL, inv_Lmet2, inv_metmet = (
+                a.take(segment) for a in (self.scale, self.base, self.mean_L, self.mean_met,
+                                          self.inv_LL, self.inv_Lmet2, self.inv_metmet))
+        dL = X[:, 0] - mean_L
+        dmet = X[:, 1] - mean_met
+        # In place, in the order of half_width_one: scale * (base + ((a dL) dL + (b dL) dmet + (c dmet) dmet))
+        q = inv_LL * dL
+        q *= dL
+        cross = inv_Lmet2 * dL
+        cross *= dmet
+        q += cross
+        np.multiply(inv_metmet, dmet, out=cross)
+        cross *= dmet
+        q += cross
+        q += base
+        q *= scale
+        return np.sqrt(q, out=q)
+
+    def half_width_one(self, log_L: float, met: float, segment: int = 0) -> float:
+        """ half_width of one row with Python floats; same operations in the same order """
+        scale, base, mean_L, mean_met, inv_LL, inv_Lmet2, inv_metmet = (t[segment] for t in self._terms)
+        dL = log_L - mean_L
+        dmet = met - mean_met
+        return math.sqrt(scale * (base + (inv_LL * dL * dL + inv_Lmet2 * dL * dmet + inv_metmet * dmet * dmet)))
+
+
+class LinearModel:
+    """ Vectorized evaluation of intercept + coef·[L, met] in log space.
+
+    Loaded from the model.json artifact written by modeling/export.py, so
+    scoring needs neither scikit-learn nor pandas. Inputs are in the units
+    the frontend uses: luminosity in L_sun and metallicity as log10(Fe/H);
+    outputs are masses in M_sun. """
+
+    def __init__(self, intercept: float, coef, features=("L", "met"),
+                 log_L_sun_W: float = LOG_L_SUN_W, M_sun_kg: float = M_SUN_KG, interval: dict | None = None):
+        if list(features) != ["L", "met"]:
+            raise ValueError(f"Unsupported feature order {features}")
+        self.intercept = float(intercept)
+        self.coef = np.asarray(coef, dtype=np.float64).ravel()
+        self.features = list(features)
+        # The model expects the luminosity in log watts
+        self.log_L_sun_W = log_L_sun_W
+        self.M_sun_kg = M_sun_kg
+
+        self.interval = PredictionInterval(interval) if interval else None
+
+        params = [self.intercept, self.coef.tolist(), self.features, log_L_sun_W, M_sun_kg]
+        self.version = _version(params + [interval] if interval else params)
+
+    @classmethod
+    def load(cls, path: str = "model.json"):
+        with open(path) as f:
+            return cls.from_artifact(json.load(f))
+
+    @classmethod
+    def from_artifact(cls, artifact: dict):
+        if artifact.get("format") != FORMAT:
+            raise ValueError(f"Not a {FORMAT} artifact")
+        units = artifact["units"]
+        return cls(artifact["intercept"], artifact["coef"], artifact["features"],
+                   units["log_L_sun_W"], units["M_sun_kg"], artifact.get("interval"))
+
+    def predict_log(self, X: np.ndarray) -> np.ndarray:
+        """ log10 of mass in kg for a (n, 2) design matrix of [log W, log Fe/H] """
+        return self.intercept + X @ self.coef
+
+    def predict_log_interval(self, X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """ predict_log(X) and the half-widths of its prediction intervals """
+        if len(X) == 1:
+            return self.predict_log(X), np.array([self.interval.half_width_one(float(X[0, 0]), float(X[0, 1]))])
+        return self.predict_log(X), self.interval.half_width(X)
+
+    def design(self, luminosity, metallicity) -> np.ndarray:
+        """ (n, 2) design matrix of [log W, log Fe/H] from frontend units """
+        luminosity = np.asarray(luminosity, dtype=np.float64)
+        metallicity = np.asarray(metallicity, dtype=np.float64)
+
+        X = np.empty((luminosity.size, 2), dtype=np.float64)
+        np.log10(luminosity.ravel(), out=X[:, 0])
+        X[:, 0] += self.log_L_sun_W
+        X[:, 1] = metallicity.ravel()
+        return X
+
+    def predict(self, luminosity, metallicity) -> np.ndarray:
+        return 10**self.predict_log(self.design(luminosity, metallicity)) / self.M_sun_kg
+
+    def predict_interval(self, luminosity, metallicity) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """ Masses in M_sun with the low and high bounds of their prediction
+        intervals at self.interval.level. The interval is symmetric in log
+        mass, so the bounds are a factor apart from the mass on either side.
+        Needs a model exported with interval parameters. """
+        if self.interval is None:
+            raise ValueError("The model carries no prediction interval parameters")
+        log_M, half = self.predict_log_interval(self.design(luminosity, metallicity))
+        # One power and one division over all three rows; the same operations as predict
+        out = np.empty((3, log_M.size), dtype=np.float64)
+        out[0] = log_M
+        np.subtract(log_M, half, out=out[1])
+        np.add(log_M, half, out=out[2])
+        np.power(10.0, out, out=out)
+        out /= self.M_sun_kg
+        return out[0], out[1], out[2]
+
+
+class PiecewiseLinearModel(LinearModel):
+    """ One intercept + coef·[L, met] per luminosity segment.
+
+    edges are the interior segment boundaries in log W, sorted; segment i
+    covers edges[i-1] <= L < edges[i], as in modeling/piecewise.py. Every
+    input is routed by comparing it with the few edges and its
+    coefficients are gathered by index, so a batch is scored in a handful
+    of vectorized passes and a single request costs about as much as with
+    one segment. """
+
+    def __init__(self, edges, intercept, coef, features=("L", "met"), segment_by: str = "L",
+                 log_L_sun_W: float = LOG_L_SUN_W, M_sun_kg: float = M_SUN_KG, interval: dict | None = None):
+        if list(features) != ["L", "met"] or segment_by != "L":
+            raise ValueError(f"Unsupported features {features} segmented by {segment_by}")
+        self.edges = np.asarray(edges, dtype=np.float64).ravel()
+        self.intercept = np.asarray(intercept, dtype=np.float64).ravel()
+        self.coef = np.asarray(coef, dtype=np.float64).reshape(len(self.intercept), 2)
+        if len(self.intercept) != len(self.edges) + 1 or np.any(np.diff(self.edges) <= 0):
+            raise ValueError("Segments need one more intercept than edges, and increasing edges")
+        self.features = list(features)
+        self.segment_by = segment_by
+        self.log_L_sun_W = log_L_sun_W
+        self.M_sun_kg = M_sun_kg
+        self.interval = PredictionInterval(interval, len(self.intercept)) if interval else None
+
+        params = [self.edges.tolist(), self.intercept.tolist(), self.coef.tolist(), self.features,
+                  log_L_sun_W, M_sun_kg]
+        self.version = _version(params + [interval] if interval else params)
+
+        # Contiguous per-feature coefficients for take(), and plain lists for the scalar path
+        self.coef_L, self.coef_met = np.ascontiguousarray(self.coef.T)
+        self._edges, self._intercept = self.edges.tolist(), self.intercept.tolist()
+        self._coef_L, self._coef_met = self.coef_L.tolist(), self.coef_met.tolist()
+
+    @classmethod
+    def from_artifact(cls, artifact: dict):
+        if artifact.get("format") != PIECEWISE_FORMAT:
+            raise ValueError(f"Not a {PIECEWISE_FORMAT} artifact")
+        units = artifact["units"]
+        return cls(artifact["edges"], artifact["intercept"], artifact["coef"], artifact["features"],
+                   artifact["segment_by"], units["log_L_sun_W"], units["M_sun_kg"], artifact.get("interval"))
+
+    def segment(self, log_L: np.ndarray) -> np.ndarray:
+        """ Segment index of every log luminosity (the number of edges <= it).
+        One comparison pass per edge beats a binary search per value for
+        the few edges a model has. """
+        segment = np.zeros(log_L.shape, dtype=np.intp)
+        for edge in self.edges:
+            segment += log_L >= edge
+        return segment
+
+    def _predict_log_one(self, log_L: float, met: float, i: int) -> float:
+        return self._intercept[i] + log_L * self._coef_L[i] + met * self._coef_met[i]
+
+    def _predict_log(self, X: np.ndarray, segment: np.ndarray) -> np.ndarray:
+        out = self.intercept.take(segment)
+        out += X[:, 0] * self.coef_L.take(segment)
+        out += X[:, 1] * self.coef_met.take(segment)
+        return out
+
+    def predict_log(self, X: np.ndarray) -> np.ndarray:
+        if len(X) == 1:
+            # Single requests skip the array machinery; same operations in the same order
+            log_L, met = float(X[0, 0]), float(X[0, 1])
+            return np.array([self._predict_log_one(log_L, met, bisect.bisect_right(self._edges, log_L))])
+        return self._predict_log(X, self.segment(X[:, 0]))
+
+    def predict_log_interval(self, X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # Routed once for both the prediction and its interval
+        if len(X) == 1:
+            log_L, met = float(X[0, 0]), float(X[0, 1])
+            i = bisect.bisect_right(self._edges, log_L)
+            return (np.array([self._predict_log_one(log_L, met, i)]),
+                    np.array([self.interval.half_width_one(log_L, met, i)]))
+        segment = self.segment(X[:, 0])
+        return self._predict_log(X, segment), self.interval.half_width(X, segment)
+
+
+MODELS = {FORMAT: LinearModel, PIECEWISE_FORMAT: PiecewiseLinearModel}
+
+
+def model_from_artifact(artifact: dict) -> LinearModel:
+    """ The model class matching the artifact's format """
+    if artifact.get("format") not in MODELS:
+        raise ValueError(f"Unsupported model format {artifact.get('format')}")
+    return MODELS[artifact["format"]].from_artifact(artifact)
+
+
+def load_model(path: str = "model.json") -> LinearModel:
+    with open(path) as f:
+        return model_from_artifact(json.load(f))
@@ -0,0 +1,127 @@
+""" Multi-resolution index over the (M, log L) plane for level-of-detail queries.
+
+Points are sorted by their Morton (Z-order) code on a 2^depth x 2^depth grid,
+so every cell of every coarser level is a contiguous slice of the sorted
+arrays. Level k keeps, per non-empty cell, its grid coordinates, the
+offset of its slice and its point count.
+
+A query picks the level whose grid puts roughly `target` cells in the
+viewport and then either returns the cell counts (a 2D histogram) or a
+stratified subsample: each visible cell contributes points in proportion
+to its count, taken at evenly spaced positions along its Z-order slice,
+with a weight telling how many stars each returned point stands for.
+Work per query is bounded by the number of cells at the chosen level and
+the number of points returned, not by the catalog size.
+"""
+import math
+import numpy as np
+
+
+def _spread_bits(v: np.ndarray) -> np.ndarray:
+    """ Inserts a zero bit between each of the low 16 bits of v """
+    v = v.astype(np.uint64) & 0xFFFF
+    v = (v | (v << 8)) & 0x00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F
+    v = (v | (v << 2)) & 0x33333333
+    v = (v | (v << 1)) & 0x55555555
+    return v
+
+
+def _compact_bits(v: np.ndarray) -> np.ndarray:
+    v = v & 0x55555555
+    v = (v | (v >> 1)) & 0x33333333
+    v = (v | (v >> 2)) & 0x0F0F0F0F
+    v = (v | (v >> 4)) & 0x00FF00FF
+    v = (v | (v >> 8)) & 0x0000FFFF
+    return v.astype(np.int64)
+
+
+def _gather(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """ Concatenation of arange(s, s + l) for each (s, l), without a Python loop """
+    total = int(lengths.sum())
+    if not total:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return np.arange(total, dtype=np.int64) + offsets
+
+
+class LODIndex:
+    def __init__(self, x: np.ndarray, y: np.ndarray, depth: int = 10):
+        if depth > 16:
+            raise ValueError("depth is limited to 16 bits per axis")
+        finite = np.isfinite(x) & np.isfinite(y)
+        x, y = x[finite], y[finite]
+        self.depth = depth
+        self.n = x.size
+        self.x0, self.x1 = (float(x.min()), float(x.max())) if self.n else (0.0, 1.0)
+        self.y0, self.y1 = (float(y.min()), float(y.max())) if self.n else (0.0, 1.0)
+        # Avoid zero-width bounds for degenerate catalogs
+        self.width = (self.x1 - self.x0) or 1.0
+        self.height = (self.y1 - self.y0) or 1.0
+
+        side = 2**depth
+        ix = np.clip(((x - self.x0) / self.width * side).astype(np.int64), 0, side - 1)
+        iy = np.clip(((y - self.y0) / self.height * side).astype(np.int64), 0, side - 1)
+        codes = _spread_bits(ix) | (_spread_bits(iy) << np.uint64(1))
+        order = np.argsort(codes, kind="stable")
+        codes = codes[order]
+        self.x, self.y = x[order], y[order]
+
+        self.levels = []
+        for k in range(depth + 1):
+            parent = codes >> np.uint64(2 * (depth - k))
+            starts = np.flatnonzero(np.r_[True, parent[1:] != parent[:-1]]) if self.n else np.empty(0, np.int64)
+            counts = np.diff(np.r_[starts, self.n])
+            cells = parent[starts]
+            self.levels.append((_compact_bits(cells), _compact_bits(cells >> np.uint64(1)), starts, counts))
+
+    def bounds(self) -> dict:
+        return {"x_min": self.x0, "x_max": self.x1, "y_min": self.y0, "y_max": self.y1}
+
+    def level_for(self, x_min: float, x_max: float, y_min: float, y_max: float, target: int) -> int:
+        """ Finest level at which the viewport spans at most ~target grid cells """
+        fx = min(1.0, max(x_max - x_min, 0.0) / self.width) or 1.0 / 2**self.depth
+        fy = min(1.0, max(y_max - y_min, 0.0) / self.height) or 1.0 / 2**self.depth
+        k = math.floor(math.log(max(target, 1) / (fx * fy), 4))
+        return int(min(max(k, 0), self.depth))
+
+    def _visible(self, k: int, x_min, x_max, y_min, y_max):
+        cx, cy, starts, counts = self.levels[k]
+        cw, ch = self.width / 2**k, self.height / 2**k
+        lo_x, lo_y = self.x0 + cx * cw, self.y0 + cy * ch
+        mask = (lo_x <= x_max) & (lo_x + cw >= x_min) & (lo_y <= y_max) & (lo_y + ch >= y_min)
+        return cx[mask], cy[mask], starts[mask], counts[mask], cw, ch
+
+    def histogram(self, x_min, x_max, y_min, y_max, target: int) -> dict:
+        k = self.level_for(x_min, x_max, y_min, y_max, target)
+        cx, cy, _, counts, cw, ch = self._visible(k, x_min, x_max, y_min, y_max)
+        return {
+            "level": k,
+            "bin_width": cw,
+            "bin_height": ch,
+            "x": (self.x0 + cx * cw).tolist(),
+            "y": (self.y0 + cy * ch).tolist(),
+            "count": counts.tolist(),
+        }
+
+    def sample(self, x_min, x_max, y_min, y_max, target: int):
+        """ Returns (x, y, weight, level, exact) for at most about target points """
+        k = self.level_for(x_min, x_max, y_min, y_max, target)
+        _, _, starts, counts, _, _ = self._visible(k, x_min, x_max, y_min, y_max)
+        total = int(counts.sum())
+
+        exact = total <= target
+        if exact:
+            idx = _gather(starts, counts)
+            weight = np.ones(idx.size)
+        else:
+            quota = np.clip(np.rint(counts * (target / total)).astype(np.int64), 1, counts)
+            cell = np.repeat(np.arange(counts.size), quota)
+            j = _gather(np.zeros_like(quota), quota)
+            # Evenly spaced picks along each cell's Z-order slice are spatially stratified
+            idx = starts[cell] + (2 * j + 1) * counts[cell] // (2 * quota[cell])
+            weight = (counts / quota)[cell]
+
+        x, y = self.x[idx], self.y[idx]
+        inside = (x >= x_min) & (x <= x_max) & (y >= y_min) & (y <= y_max)
+        return x[inside], y[inside], weight[inside], k, exact
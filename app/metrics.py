@@ -0,0 +1,140 @@
+""" In-process request metrics rendered in the Prometheus text format.
+
+Each gunicorn/uvicorn worker keeps its own registry, so /metrics reports
+the worker that served the scrape; scrape per machine with a single worker
+or aggregate on the Prometheus side.
+
+Slow requests can be profiled: with PROFILE_SAMPLE_RATE > 0 a sampled
+fraction of requests runs under cProfile and those slower than
+PROFILE_SLOW_MS are dumped to PROFILE_DIR as .prof files (open them with
+pstats or snakeviz).
+"""
+import bisect
+import cProfile
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = tuple(64 * 4**i for i in range(10))     # 64 B .. 16 MiB
+
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", 250))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}   # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        names = self.labelnames + ("le",)
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(names, labels + (bound,))} {cumulative}"
+            yield f"{self.name}_bucket{_labels(names, labels + ('+Inf',))} {series[-1]}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-2]}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {series[-1]}"
+
+
+requests_total = Counter("http_requests_total", "Requests served", ("route", "method", "status"))
+request_seconds = Histogram("http_request_duration_seconds", "Request latency", ("route",))
+response_bytes = Histogram("http_response_size_bytes", "Response body size", ("route",), SIZE_BUCKETS)
+stage_seconds = Histogram("stage_duration_seconds", "Time spent per request stage", ("stage",))
+slow_profiles = Counter("slow_request_profiles_total", "cProfile dumps written for slow requests", ("route",))
+
+REGISTRY = [requests_total, request_seconds, response_bytes, stage_seconds, slow_profiles]
+
+
+@contextmanager
+def stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, name)
+
+
+class RequestTimer:
+    """ Times one request; call finish() with the status and body size """
+
+    def __init__(self, route: str, method: str, profile: bool = True):
+        self.route, self.method = route, method
+        self.profiler = None
+        if profile and PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+            self.profiler = cProfile.Profile()
+            try:
+                self.profiler.enable()
+            except ValueError:      # Another profiler is active in this process
+                self.profiler = None
+        self.start = time.perf_counter()
+
+    def finish(self, status: int, nbytes: int | None):
+        elapsed = time.perf_counter() - self.start
+        requests_total.inc(self.route, self.method, status)
+        request_seconds.observe(elapsed, self.route)
+        if nbytes is not None:
+            response_bytes.observe(nbytes, self.route)
+
+        if self.profiler is not None:
+            self.profiler.disable()
+            if elapsed * 1000 >= PROFILE_SLOW_MS:
+                os.makedirs(PROFILE_DIR, exist_ok=True)
+                name = f"{self.route.strip('/').replace('/', '_') or 'index'}-{time.time_ns()}-{os.getpid()}.prof"
+                self.profiler.dump_stats(os.path.join(PROFILE_DIR, name))
+                slow_profiles.inc(self.route)
+
+
+def render(extra: dict | None = None) -> bytes:
+    """ Prometheus exposition text; extra maps gauge names to values """
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for name, value in (extra or {}).items():
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return ("\n".join(lines) + "\n").encode("utf-8")
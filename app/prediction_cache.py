@@ -0,0 +1,153 @@
+""" Memoization of /predict responses keyed on quantized inputs.
+
+Slider-driven clients send many nearly identical requests, so inputs are
+rounded before they are used as a key: luminosity to a number of
+significant digits (it spans orders of magnitude) and metallicity to a
+fixed number of decimals. Keys also carry the model and catalog versions,
+so a redeploy never serves stale bodies.
+
+LRUCache is per process. DiskCache is an optional SQLite file shared by
+all workers on the machine; PredictionCache layers the two.
+"""
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def quantize(luminosity: float, metallicity: float, significant: int = 6, decimals: int = 4):
+    if luminosity > 0 and math.isfinite(luminosity):
+        luminosity = float(f"{luminosity:.{significant - 1}e}")
+    return luminosity, round(metallicity, decimals)
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "maxsize": self.maxsize,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class DiskCache:
+    """ Cross-worker cache in a local SQLite file, evicting least recently used rows """
+
+    def __init__(self, path: str, maxsize: int = 100_000):
+        self.path = path
+        self.maxsize = maxsize
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS cache "
+                       "(key TEXT PRIMARY KEY, value BLOB, used REAL)")
+            db.execute("CREATE INDEX IF NOT EXISTS cache_used ON cache(used)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connections may not be shared between threads
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            self._local.db = db
+        return db
+
+    def get(self, key):
+        try:
+            db = self._connect()
+            row = db.execute("SELECT value FROM cache WHERE key = ?", (repr(key),)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            db.execute("UPDATE cache SET used = ? WHERE key = ?", (time.time(), repr(key)))
+        except sqlite3.Error:
+            # A busy or broken cache file must never fail the request
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def set(self, key, value: bytes):
+        try:
+            db = self._connect()
+            db.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?)", (repr(key), value, time.time()))
+            (size,) = db.execute("SELECT COUNT(*) FROM cache").fetchone()
+            if size > self.maxsize:
+                cursor = db.execute("DELETE FROM cache WHERE key IN "
+                                    "(SELECT key FROM cache ORDER BY used LIMIT ?)", (size - self.maxsize,))
+                self.evictions += cursor.rowcount
+        except sqlite3.Error:
+            pass
+
+    def clear(self):
+        self._connect().execute("DELETE FROM cache")
+
+    def stats(self) -> dict:
+        try:
+            (size,) = self._connect().execute("SELECT COUNT(*) FROM cache").fetchone()
+        except sqlite3.Error:
+            size = None
+        return {"size": size, "maxsize": self.maxsize,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class PredictionCache:
+    def __init__(self, maxsize: int = 4096, shared_path: str | None = None,
+                 significant: int = 6, decimals: int = 4):
+        self.memory = LRUCache(maxsize)
+        self.shared = DiskCache(shared_path) if shared_path else None
+        self.significant = significant
+        self.decimals = decimals
+
+    def key(self, luminosity: float, metallicity: float, *versions):
+        return (*versions, *quantize(luminosity, metallicity, self.significant, self.decimals))
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key, value: bytes):
+        self.memory.set(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value)
+
+    def stats(self) -> dict:
+        stats = {"memory": self.memory.stats()}
+        if self.shared is not None:
+            stats["shared"] = self.shared.stats()
+        return stats
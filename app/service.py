@@ -0,0 +1,206 @@
+""" Framework-independent request handling shared by the Flask app (app.py)
+and the ASGI app (asgi.py).
+
+Handlers take plain values pulled from the request and return
+(status, headers, body), where body is bytes or, for streamed batch
+results, an iterator of str chunks. Model, catalog and prediction cache
+are created once per worker at import. """
+import math
+import os
+import warnings
+from catalog import CatalogStore, dumps
+from inference import load_model
+from http_cache import available_encodings, etag_matches, negotiate_encoding, negotiate_mimetype
+from prediction_cache import PredictionCache
+import columns
+import metrics
+
+config = {
+    "MAX_BATCH_ROWS": int(os.environ.get("MAX_BATCH_ROWS", 1_000_000)),
+    "BATCH_CHUNK_ROWS": int(os.environ.get("BATCH_CHUNK_ROWS", 10_000)),
+    "CATALOG_MAX_AGE": int(os.environ.get("CATALOG_MAX_AGE", 300)),
+    "PREDICTION_CACHE_SIZE": int(os.environ.get("PREDICTION_CACHE_SIZE", 4096)),
+    "PREDICTION_CACHE_PATH": os.environ.get("PREDICTION_CACHE_PATH"),
+    "LOD_DEFAULT_POINTS": int(os.environ.get("LOD_DEFAULT_POINTS", 5_000)),
+    "LOD_MAX_POINTS": int(os.environ.get("LOD_MAX_POINTS", 50_000)),
+    "CATALOG_PATH": os.environ.get("CATALOG_PATH", "joined_out.csv"),
+    "MODEL_PATH": os.environ.get("MODEL_PATH", "model.json"),
+}
+
+# Fast boot restores the model and catalog from the prebuilt snapshot
+# (see snapshot.py) instead of parsing model.json and the catalog file,
+# as long as the snapshot was built from those files as they are now
+model = None
+if os.environ.get("FAST_BOOT", "1") == "1" and os.path.exists("snapshot.bin"):
+    import snapshot
+    try:
+        model, catalog, _ = snapshot.load("snapshot.bin", config["CATALOG_PATH"], config["MODEL_PATH"])
+    except snapshot.StaleSnapshot as e:
+        warnings.warn(f"{e}; loading {config['MODEL_PATH']} and {config['CATALOG_PATH']} instead")
+if model is None:
+    model = load_model(config["MODEL_PATH"])
+    catalog = CatalogStore(config["CATALOG_PATH"]).refresh()
+
+prediction_cache = PredictionCache(config["PREDICTION_CACHE_SIZE"], config["PREDICTION_CACHE_PATH"])
+
+JSON = "application/json"
+CATALOG_FORMATS = [JSON, columns.MIMETYPE]
+
+BATCH_FORMATS = {
+    "application/json": "json",
+    "application/x-ndjson": "ndjson",
+    "text/csv": "csv",
+}
+
+
+def error(message: str, status: int = 400):
+    return status, {"Content-Type": JSON}, dumps({"error": message})
+
+
+def predict(data, point_only: bool = False, accept: str | None = None):
+    if not isinstance(data, dict):
+        return error("Missing parameters")
+    luminosity = data.get("luminosity")
+    metallicity = data.get("metallicity")
+    if luminosity is None or metallicity is None:
+        return error("Missing parameters")
+    # Coerced before anything else sees them: the cache key quantizes floats
+    try:
+        luminosity, metallicity = float(luminosity), float(metallicity)
+    except (TypeError, ValueError, OverflowError):
+        return error("luminosity and metallicity must be numeric")
+    # Same rule as parse_batch: log10(0) or of a negative luminosity is no mass, and NaN is no JSON
+    if not (math.isfinite(luminosity) and luminosity > 0 and math.isfinite(metallicity)):
+        return error("luminosity must be positive and all values finite")
+
+    # Clients holding a cached /graph_data can ask for the predicted point only
+    point_only = point_only or data.get("catalog", True) is False
+    mimetype = JSON if point_only else negotiate_mimetype(accept, CATALOG_FORMATS, JSON)
+    headers = {"Content-Type": mimetype, "X-Catalog-ETag": catalog.etag(), "X-Model-Version": model.version}
+    if model.interval is not None:
+        headers["X-Interval-Level"] = str(model.interval.level)
+
+    with metrics.stage("cache_lookup"):
+        key = prediction_cache.key(luminosity, metallicity, model.version, catalog.version, point_only, mimetype)
+        body = prediction_cache.get(key)
+    if body is None:
+        with metrics.stage("inference"):
+            if model.interval is not None:
+                mass, low, high = (float(v[0]) for v in model.predict_interval(luminosity, metallicity))
+                predicted = {"M": mass, "M_low": low, "M_high": high, "L": luminosity}
+            else:
+                predicted = {"M": float(model.predict(luminosity, metallicity)[0]), "L": luminosity}
+        with metrics.stage("payload"):
+            if point_only:
+                body = dumps({"predicted": predicted})
+            elif mimetype == columns.MIMETYPE:
+                body = catalog.predict_columns(predicted)
+            else:
+                body = catalog.predict_payload(predicted)
+        prediction_cache.set(key, body)
+
+    return 200, headers, body
+
+
+def predict_batch(body: bytes, content_type: str, accept: str):
+    # Imported lazily, only batch clients pay for it
+    from batch import BatchError, parse_batch, render_batch
+    try:
+        with metrics.stage("batch_parse"):
+            luminosity, metallicity = parse_batch(body, content_type, config["MAX_BATCH_ROWS"])
+    except BatchError as e:
+        return error(e.message, e.status)
+
+    with metrics.stage("batch_inference"):
+        if model.interval is not None:
+            prediction, low, high = model.predict_interval(luminosity, metallicity)
+        else:
+            prediction, low, high = model.predict(luminosity, metallicity), None, None
+
+    mimetype = negotiate_mimetype(accept, list(BATCH_FORMATS), JSON)
+    headers = {"Content-Type": mimetype}
+    if model.interval is not None:
+        headers["X-Interval-Level"] = str(model.interval.level)
+    chunks = render_batch(luminosity, prediction, BATCH_FORMATS[mimetype], config["BATCH_CHUNK_ROWS"], low, high)
+    if luminosity.size <= config["BATCH_CHUNK_ROWS"]:
+        with metrics.stage("batch_render"):
+            body = "".join(chunks).encode("utf-8")
+        return 200, headers, body
+    return 200, headers, chunks
+
+
+def graph_data(accept_encoding: str, if_none_match: str, accept: str | None = None):
+    mimetype = negotiate_mimetype(accept, CATALOG_FORMATS, JSON)
+    # Packed float32 columns barely compress, so only JSON is content-encoded
+    binary = mimetype == columns.MIMETYPE
+    encoding = None if binary else negotiate_encoding(accept_encoding, available_encodings())
+    etag = catalog.etag("columns" if binary else encoding)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={config['CATALOG_MAX_AGE']}",
+        "Vary": "Accept, Accept-Encoding",
+    }
+    if etag_matches(if_none_match, etag):
+        return 304, headers, b""
+
+    headers["Content-Type"] = mimetype
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    with metrics.stage("graph_payload"):
+        body = catalog.graph_columns() if binary else catalog.graph_payload(encoding)
+    return 200, headers, body
+
+
+def graph_lod(args):
+    """ Density-preserving view of the catalog for a viewport in (M, log10 L).
+
+    args maps query parameters (m_min, m_max, logl_min, logl_max, n, mode)
+    to strings; missing bounds default to the catalog extent. mode=points
+    returns a weighted subsample, mode=histogram the per-cell counts. """
+    index = catalog.lod_index()
+    bounds = index.bounds()
+    try:
+        x_min = float(args.get("m_min", bounds["x_min"]))
+        x_max = float(args.get("m_max", bounds["x_max"]))
+        y_min = float(args.get("logl_min", bounds["y_min"]))
+        y_max = float(args.get("logl_max", bounds["y_max"]))
+        target = int(args.get("n", config["LOD_DEFAULT_POINTS"]))
+    except ValueError:
+        return error("Viewport bounds and n must be numeric")
+    if target < 1 or x_min > x_max or y_min > y_max:
+        return error("Empty viewport")
+    target = min(target, config["LOD_MAX_POINTS"])
+    mode = args.get("mode", "points")
+
+    with metrics.stage("lod_query"):
+        if mode == "histogram":
+            result = index.histogram(x_min, x_max, y_min, y_max, target)
+            result = {"level": result["level"],
+                      "bin_width_M": result["bin_width"], "bin_height_logL": result["bin_height"],
+                      "M": result["x"], "logL": result["y"], "count": result["count"]}
+        elif mode == "points":
+            M, logL, weight, level, exact = index.sample(x_min, x_max, y_min, y_max, target)
+            result = {"level": level, "exact": exact,
+                      "M": M.tolist(), "L": (10**logL).tolist(), "weight": weight.tolist()}
+        else:
+            return error(f"Unknown mode {mode}")
+
+    headers = {
+        "Content-Type": JSON,
+        "Cache-Control": f"public, max-age={config['CATALOG_MAX_AGE']}",
+        "X-Catalog-ETag": catalog.etag(),
+    }
+    return 200, headers, dumps(result)
+
+
+def cache_stats():
+    return 200, {"Content-Type": JSON}, dumps(prediction_cache.stats())
+
+
+def metrics_text():
+    gauges = {}
+    for layer, stats in prediction_cache.stats().items():
+        for name, value in stats.items():
+            if value is not None:
+                gauges[f"prediction_cache_{layer}_{name}"] = value
+    return 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}, metrics.render(gauges)
@@ -0,0 +1,125 @@
+""" Preformatted binary snapshot of the catalog and model for fast boots.
+
+Layout: MAGIC | uint32 header length | JSON header | 8-byte aligned blobs.
+The header holds the model artifact and the offset, size and dtype of each
+blob, so loading is one file read plus np.frombuffer views; nothing is
+parsed or re-serialized. It also records the size, mtime and SHA-256 of
+the catalog and model files the snapshot was built from, so a snapshot
+that no longer matches them is refused at load.
+
+Build it next to the app files with `python snapshot.py`.
+"""
+import hashlib
+import json
+import os
+import struct
+import numpy as np
+from catalog import CatalogStore
+from inference import model_from_artifact
+
+MAGIC = b"SMPSNAP1"
+ALIGN = 8
+
+
+class StaleSnapshot(ValueError):
+    pass
+
+
+def _digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _source(path: str) -> dict:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": _digest(path)}
+
+
+def _unchanged(path: str, source: dict | str) -> bool:
+    # Size and mtime decide without reading the file; only a file whose stat changed is hashed,
+    # so one touched but not modified still matches. Older snapshots recorded the digest only.
+    if not os.path.exists(path):
+        return False
+    stat = os.stat(path)
+    if isinstance(source, dict) and (stat.st_size, stat.st_mtime_ns) == (source["size"], source["mtime_ns"]):
+        return True
+    return _digest(path) == (source["sha256"] if isinstance(source, dict) else source)
+
+
+def build(catalog_path: str = "joined_out.csv", model_path: str = "model.json", out: str = "snapshot.bin"):
+    catalog = CatalogStore(catalog_path).refresh()
+    with open(model_path) as f:
+        artifact = json.load(f)
+    model_from_artifact(artifact)     # Validates the artifact before it is baked in
+
+    blobs = {
+        "M": np.ascontiguousarray(catalog.M, dtype="<f8"),
+        "L": np.ascontiguousarray(catalog.L, dtype="<f8"),
+        "stars_json": catalog.stars_json,
+    }
+    layout, offset = {}, 0
+    for name, blob in blobs.items():
+        data = blob.tobytes() if isinstance(blob, np.ndarray) else blob
+        dtype = blob.dtype.str if isinstance(blob, np.ndarray) else None
+        layout[name] = [offset, len(data), dtype]
+        offset += len(data) + (-len(data) % ALIGN)
+
+    header = json.dumps({
+        "model": artifact,
+        "blobs": layout,
+        "sources": {catalog_path: _source(catalog_path), model_path: _source(model_path)},
+    }).encode("utf-8")
+    start = len(MAGIC) + 4 + len(header)
+    padding = -start % ALIGN
+
+    with open(out, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(header)) + header + b"\0" * padding)
+        for name, blob in blobs.items():
+            data = blob.tobytes() if isinstance(blob, np.ndarray) else blob
+            f.write(data + b"\0" * (-len(data) % ALIGN))
+    return out
+
+
+def load(path: str = "snapshot.bin", catalog_path: str | None = None, model_path: str | None = None):
+    """ Returns (model, CatalogStore, header) restored from a snapshot.
+
+    With catalog_path and model_path, raises StaleSnapshot unless the
+    snapshot was built from those files as they are now. The restored
+    catalog then keeps refreshing from catalog_path, like a CatalogStore
+    that read the file itself. """
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a catalog snapshot")
+
+    (header_len,) = struct.unpack_from("<I", data, len(MAGIC))
+    start = len(MAGIC) + 4
+    header = json.loads(data[start:start + header_len])
+    base = start + header_len
+    base += -base % ALIGN
+
+    sources = header.get("sources", {})
+    changed = [p for p in (catalog_path, model_path)
+               if p is not None and not (p in sources and _unchanged(p, sources[p]))]
+    if changed:
+        raise StaleSnapshot(f"{path} was not built from the current {' and '.join(changed)}")
+
+    def blob(name):
+        offset, size, dtype = header["blobs"][name]
+        if dtype is None:
+            return data[base + offset:base + offset + size]
+        return np.frombuffer(data, dtype=dtype, count=size // np.dtype(dtype).itemsize, offset=base + offset)
+
+    model = model_from_artifact(header["model"])
+    catalog = CatalogStore.from_arrays(blob("M"), blob("L"), blob("stars_json"), catalog_path)
+    return model, catalog, header
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Build the fast-boot snapshot")
+    parser.add_argument("--catalog", default=os.environ.get("CATALOG_PATH", "joined_out.csv"))
+    parser.add_argument("--model", default=os.environ.get("MODEL_PATH", "model.json"))
+    parser.add_argument("--out", default="snapshot.bin")
+    args = parser.parse_args()
+    print("Wrote", build(args.catalog, args.model, args.out))
@@ -8,9 +8,9 @@ import mplcursors
 # dimensions: [L]=L_sun, [met]=log(n_Fe/n_H)
 def create_plot(L, met):
     dir = Path(__file__).resolve().parent
-    path = dir / "../modeling/preprocessor/output/gaia_out.csv"
+    path = dir / "../modeling/preprocessor/output/gaia_out.parquet"
 
-    df = pd.read_csv(path)
+    df = pd.read_parquet(path, columns=["M", "L"])
 
     reg_coef = (24.49554961, 0.21843771, 0.00115995)   # From modeling on the same df: (intercept, luminosity, metallicity)
 
@@ -21,8 +21,6 @@ def create_plot(L, met):
     df["M"] = 10**df["M"] / M_sun.value
     df["L"] = 10**df["L"] / L_sun.value
 
-    df = df.drop(columns=["source_id", "met", "evolstage_flame", "Teff", "R", "spectype"])
-
     label_df = pd.DataFrame({
         "Name": ["\N{GREEK SMALL LETTER ALPHA} Canis Majoris A",
                  "\N{GREEK SMALL LETTER ALPHA} Piscis Austrini",
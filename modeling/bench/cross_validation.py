@@ -0,0 +1,76 @@
+""" Time of the evaluate stage: one evaluation.cross_validate call, which
+fits every fold once, against the previous stage, which went over the folds
+three times (cross_val_score for r2, again for MSE, then a refit loop for
+the out-of-fold residuals).
+
+    python bench/cross_validation.py --rows 100000     (from modeling/)
+
+Before the timings are printed, the fold scores must equal cross_val_score
+on the same KFold and the residuals those of the refit loop. cross_validate
+is timed serial, on a thread pool, and with 2000 bootstrap intervals.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+import numpy as np
+from sklearn.linear_model import LinearRegression
+from sklearn.model_selection import KFold, cross_val_score
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from evaluation import cross_validate
+from synthetic import synthetic_clean
+
+
+def legacy_evaluate(clean):
+    X = clean[["L", "met"]]
+    M = clean[["M"]]
+    model = LinearRegression()
+    cv = KFold(n_splits=5, shuffle=True, random_state=1)
+
+    r2 = np.mean(cross_val_score(model, X, M, scoring='r2', cv=cv))
+    mse = -np.mean(cross_val_score(model, X, M, scoring='neg_mean_squared_error', cv=cv))
+
+    residuals = []
+    for train_i, test_i in cv.split(X):
+        model.fit(X.to_numpy()[train_i], M.to_numpy()[train_i])
+        residuals.extend(M.to_numpy()[test_i] - model.predict(X.to_numpy()[test_i]))
+    return r2, mse, np.ravel(residuals)
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    clean = synthetic_clean(args.rows)[["M", "L", "met"]]
+    X, M = clean[["L", "met"]], clean[["M"]]
+
+    t_old, (r2, mse, residuals) = timed(legacy_evaluate, clean)
+    t_serial, serial = timed(cross_validate, LinearRegression(), X, M, n_jobs=1)
+    t_threads, threaded = timed(cross_validate, LinearRegression(), X, M, n_jobs=-1)
+
+    cv = KFold(n_splits=5, shuffle=True, random_state=1)
+    for name, scoring, sign in [("r2", "r2", 1), ("mse", "neg_mean_squared_error", -1)]:
+        expected = sign * cross_val_score(LinearRegression(), X, M, scoring=scoring, cv=cv)
+        np.testing.assert_allclose([f[name] for f in serial["folds"]], expected, rtol=1e-10)
+    np.testing.assert_allclose([serial["r2"], serial["mse"]], [r2, mse], rtol=1e-10)
+
+    # The legacy loop concatenates residuals in fold order, cross_validate keeps row order
+    order = np.concatenate([test for _, test in cv.split(X)])
+    np.testing.assert_allclose(serial["residuals"][0][order], residuals, rtol=1e-9, atol=1e-12)
+    np.testing.assert_array_equal(serial["residuals"], threaded["residuals"])
+    print("identical scores and residuals")
+
+    t_boot, ci = timed(cross_validate, LinearRegression(), X, M, n_jobs=-1, n_boot=2000)
+    print(f"{args.rows} rows, 5 folds")
+    print(f"legacy evaluate        {t_old * 1e3:8.1f} ms")
+    print(f"cross_validate serial  {t_serial * 1e3:8.1f} ms")
+    print(f"cross_validate threads {t_threads * 1e3:8.1f} ms")
+    print(f"  + 2000 bootstrap CIs {t_boot * 1e3:8.1f} ms  r2 {ci['ci']['r2'][0]:.4f}..{ci['ci']['r2'][1]:.4f}")
@@ -0,0 +1,83 @@
+""" Resume check for the checkpointed TIC -> Gaia crossmatch.
+
+Run from the modeling directory:
+
+    python bench/crossmatch_resume.py --ids 5000
+
+Serves a synthetic crossmatch from crossmatch.LocalTAP, with 19-digit Gaia
+IDs and some TIC IDs that have no Gaia counterpart (<NA>, as the MAST
+service returns them). A first run is interrupted by a batch that keeps
+failing; the second run resumes from the checkpoints, so it mixes batches
+read back from disk with fresh ones. The resumed result must equal an
+uninterrupted run exactly, with the Gaia IDs still int64 and the missing
+ones still missing. Prints how many batches the second run reused.
+"""
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from preprocessor.crossmatch import CrossmatchRunner, LocalTAP
+
+# Rounds to 4955371367334609920 if it ever passes through float64
+SENTINEL_GAIA_ID = 4955371367334610048
+
+
+class FailingTAP(LocalTAP):
+    """ LocalTAP that fails every query containing fail_id """
+
+    def __init__(self, table: pd.DataFrame, fail_id: int):
+        super().__init__(table)
+        self.fail_id = str(fail_id)
+
+    def run(self, query: str) -> pd.DataFrame:
+        if self.fail_id in query:
+            raise ConnectionError("Simulated outage")
+        return super().run(query)
+
+
+def synthetic_crossmatch(n_ids: int, missing: float, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    tic = np.arange(1, n_ids + 1, dtype=np.int64) * 1000
+    gaia = pd.array(rng.integers(10**18, 7 * 10**18, n_ids), dtype="Int64")
+    gaia[rng.random(n_ids) < missing] = pd.NA
+    # The first batch holds both a missing ID and the sentinel
+    gaia[0], gaia[1] = pd.NA, SENTINEL_GAIA_ID
+    return pd.DataFrame({"tic_id": tic, "gaia_dr3_id": gaia})
+
+
+def runner(backend, checkpoint_dir=None, batch_size: int = 500) -> CrossmatchRunner:
+    return CrossmatchRunner(backend, batch_size=batch_size, max_workers=4, rate=0, retries=0,
+                            checkpoint_dir=checkpoint_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ids", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--missing", type=float, default=0.1)
+    args = parser.parse_args()
+
+    table = synthetic_crossmatch(args.ids, args.missing)
+    ids = table["tic_id"].tolist()
+    expected = runner(LocalTAP(table), batch_size=args.batch_size).run(ids)
+
+    with tempfile.TemporaryDirectory() as checkpoint_dir:
+        try:
+            runner(FailingTAP(table, ids[-1]), checkpoint_dir, args.batch_size).run(ids)
+            raise AssertionError("The interrupted run did not fail")
+        except RuntimeError as e:
+            print("First run interrupted:", e)
+        done = len(list(Path(checkpoint_dir).glob("batch_*")))
+
+        resumed = runner(LocalTAP(table), checkpoint_dir, args.batch_size).run(ids)
+
+    print(f"Second run reused {done} of {-(-len(ids) // args.batch_size)} batches")
+    pd.testing.assert_frame_equal(resumed, expected)
+    assert resumed["gaia_dr3_id"].dtype == "Int64", resumed["gaia_dr3_id"].dtype
+    assert resumed["gaia_dr3_id"].isna().sum() == table["gaia_dr3_id"].isna().sum()
+    assert SENTINEL_GAIA_ID in set(resumed["gaia_dr3_id"].dropna().tolist())
+    print("resumed crossmatch identical to an uninterrupted run, missing Gaia IDs kept")
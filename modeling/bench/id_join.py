@@ -0,0 +1,104 @@
+""" Benchmark for the NEA -> TIC -> Gaia joins on integer IDs.
+
+Run from the modeling directory:
+
+    python bench/id_join.py --rows 1000000
+
+Builds synthetic NEA rows labelled "TIC <n>", a TIC->Gaia crossmatch
+returning string IDs (as the MAST service does) and a Gaia table keyed on
+int64 source IDs. It then runs the previous path (regex list comprehension
+and string merges) and the integer path (extract_ids + join_on_ids), checks
+that they produce the same rows and prints timings and join statistics.
+"""
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from preprocessor.ids import extract_ids, format_join_stats, join_on_ids
+
+
+def clean_ids(ids: np.ndarray):
+    return [match[0]
+            if isinstance(id, str)
+            and (match := re.findall(r'\d+', id))
+            else np.nan
+            for id in ids]
+
+
+def legacy_join(nea: pd.DataFrame, xmatch: pd.DataFrame, gaia: pd.DataFrame) -> pd.DataFrame:
+    nea, xmatch, gaia = nea.copy(), xmatch.copy(), gaia.copy()
+    nea["tic_id_clean"] = np.array(clean_ids(nea["tic_id"].to_numpy()))
+    xmatch["tic_id"] = xmatch["tic_id"].astype(str)
+    nea = nea.merge(xmatch, left_on="tic_id_clean", right_on="tic_id")
+    gaia["gaia_dr3_id"] = gaia["gaia_dr3_id"].astype(str)
+    return nea.merge(gaia, on="gaia_dr3_id", suffixes=("_nea", "_gaia"))
+
+
+def integer_join(nea: pd.DataFrame, xmatch: pd.DataFrame, gaia: pd.DataFrame):
+    nea = nea.assign(tic_id_clean=extract_ids(nea["tic_id"]))
+    xmatch = xmatch.assign(tic_id=extract_ids(xmatch["tic_id"]), gaia_dr3_id=extract_ids(xmatch["gaia_dr3_id"]))
+    nea, tic_stats = join_on_ids(nea, xmatch, "tic_id_clean", "tic_id")
+    joined, gaia_stats = join_on_ids(nea, gaia, "gaia_dr3_id", suffixes=("_nea", "_gaia"))
+    return joined, tic_stats, gaia_stats
+
+
+def synthetic_tables(rows: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    stars = max(rows // 3, 1)
+    tic = rng.choice(10**9, stars, replace=False)
+    gaia_ids = np.unique(rng.integers(10**18, 7 * 10**18, stars))
+    gaia_ids = rng.permutation(np.resize(gaia_ids, stars))     # Rare collisions leave a few duplicates
+
+    labels = np.array([f"TIC {n}" for n in tic], dtype=object)
+    tic_id = labels[rng.integers(0, stars, rows)]
+    tic_id[rng.random(rows) < 0.01] = np.nan
+    nea = pd.DataFrame({"tic_id": tic_id, "M": rng.normal(30, 0.3, rows), "L": rng.normal(26, 0.5, rows)})
+
+    # The TIC has no Gaia counterpart for some stars
+    matched = rng.random(stars) < 0.9
+    xmatch = pd.DataFrame({"tic_id": tic[matched].astype(str), "gaia_dr3_id": gaia_ids[matched].astype(str)})
+
+    in_gaia = rng.random(stars) < 0.8
+    gaia = pd.DataFrame({"gaia_dr3_id": gaia_ids[in_gaia], "M": rng.normal(30, 0.3, in_gaia.sum()),
+                         "L": rng.normal(26, 0.5, in_gaia.sum())})
+    return nea, xmatch, gaia
+
+
+def canonical(df: pd.DataFrame) -> pd.DataFrame:
+    """ Keys as strings and rows sorted, to compare results up to key dtype and row order """
+    df = df.astype({c: str for c in ("tic_id_clean", "tic_id_y", "gaia_dr3_id")})
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+def timed(fn, *args, repeat: int = 3):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    nea, xmatch, gaia = synthetic_tables(args.rows)
+    print(f"NEA {len(nea)} rows, crossmatch {len(xmatch)} rows, Gaia {len(gaia)} rows")
+
+    legacy_s, expected = timed(legacy_join, nea, xmatch, gaia, repeat=args.repeat)
+    integer_s, (actual, tic_stats, gaia_stats) = timed(integer_join, nea, xmatch, gaia, repeat=args.repeat)
+    pd.testing.assert_frame_equal(canonical(actual), canonical(expected))
+
+    print(format_join_stats("NEA x TIC crossmatch", tic_stats))
+    print(format_join_stats("NEA x Gaia", gaia_stats))
+    print(f"string keys   {legacy_s * 1e3:9.1f} ms")
+    print(f"int64 keys    {integer_s * 1e3:9.1f} ms   ({legacy_s / integer_s:.1f}x)")
+    print("outputs identical")
@@ -0,0 +1,78 @@
+""" Peak memory and time of training from streamed normal-equation
+statistics (least_squares.fit_chunks over a Parquet file read in chunks)
+against LinearRegression on the loaded frame, and of exact K-fold CV from
+per-fold statistics against refitting every fold.
+
+    python bench/least_squares.py --rows 2000000 --chunksize 250000     (from modeling/)
+
+Peak memory is what tracemalloc sees during each fit, file reading
+included. Coefficients, predictions and per-fold r2 and MSE of the two
+paths must agree before anything is printed.
+"""
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+import numpy as np
+import pyarrow as pa
+from sklearn.linear_model import LinearRegression
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from evaluation import cross_validate
+from least_squares import cross_validate_statistics, fit_chunks, kfold_statistics
+from preprocessor.storage import iter_table, read_table, write_table
+from synthetic import synthetic_clean
+
+
+def traced(fn, *args, **kwargs):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def fit_in_memory(path):
+    clean = read_table(path, columns=["M", "L", "met"])
+    return LinearRegression().fit(clean[["L", "met"]], clean["M"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--chunksize", type=int, default=250_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_table(synthetic_clean(args.rows)[["M", "L", "met"]], Path(tmp) / "clean.parquet",
+                           pa.schema([(c, pa.float64()) for c in ["M", "L", "met"]]))
+
+        t_sk, mem_sk, sk = traced(fit_in_memory, path)
+        t_ne, mem_ne, ne = traced(fit_chunks, iter_table(path, columns=["M", "L", "met"], chunksize=args.chunksize),
+                                  ["L", "met"], "M", n_jobs=-1)
+
+        clean = read_table(path)
+        X, y = clean[["L", "met"]], clean["M"]
+        np.testing.assert_allclose(ne.coef_, sk.coef_, rtol=1e-10)
+        np.testing.assert_allclose(ne.predict(X), sk.predict(X), rtol=1e-12)
+
+        start = time.perf_counter()
+        refit = cross_validate(LinearRegression(), X, y, n_splits=5, random_state=1, n_jobs=1)
+        t_refit = time.perf_counter() - start
+        start = time.perf_counter()
+        exact = cross_validate_statistics(kfold_statistics(X, y, n_splits=5, random_state=1))
+        t_exact = time.perf_counter() - start
+        for metric in ["r2", "mse"]:
+            np.testing.assert_allclose([f[metric] for f in exact["folds"]], [f[metric] for f in refit["folds"]],
+                                       rtol=1e-8)
+        print("identical coefficients, predictions and fold scores")
+
+    print(f"{args.rows} rows, chunks of {args.chunksize}")
+    print(f"LinearRegression in memory   {t_sk * 1e3:8.1f} ms  peak {mem_sk / 2**20:7.1f} MiB")
+    print(f"fit_chunks streamed          {t_ne * 1e3:8.1f} ms  peak {mem_ne / 2**20:7.1f} MiB")
+    print(f"5-fold CV, refit per fold    {t_refit * 1e3:8.1f} ms")
+    print(f"5-fold CV, fold statistics   {t_exact * 1e3:8.1f} ms")
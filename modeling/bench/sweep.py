@@ -0,0 +1,78 @@
+""" Cost of scoring the 84 Sweep candidates from cached fold statistics,
+compared with what the sweep would take refitting them: building each
+candidate's design and fitting a LinearRegression per fold and group.
+
+    python bench/sweep.py --rows 200000 --sample 12     (from modeling/)
+
+Refitting every candidate takes too long to run, so --sample candidates are
+refitted. Their CV metrics must match the sweep's, and the refit time per
+candidate is extrapolated to the whole sweep. Sweep.run is timed serial and
+on a joblib pool, and both runs must give the same table.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+from sklearn.model_selection import KFold
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from sweep import Sweep, apply_design
+from synthetic import synthetic_clean
+
+
+def refit_cv(df: pd.DataFrame, spec: dict, by: str | None, min_group_rows: int = 30) -> dict:
+    """ The same CV as Sweep.evaluate by refitting on the rows """
+    X, y = apply_design(df, spec), df["M"].to_numpy()
+    groups = df[by].to_numpy() if by else np.zeros(len(df))
+    r2, mse = [], []
+    for train, test in KFold(n_splits=5, shuffle=True, random_state=1).split(X):
+        pred = np.empty(len(test))
+        for group in np.unique(groups[test]):
+            rows = train[groups[train] == group]
+            if len(rows) < max(min_group_rows, X.shape[1] + 1):
+                rows = train
+            in_group = groups[test] == group
+            # Columns scaled to unit variance, as NormalEquations.solve does
+            scale = X[rows].std(axis=0)
+            model = LinearRegression().fit(X[rows] / scale, y[rows])
+            pred[in_group] = model.predict(X[test[in_group]] / scale)
+        sse = np.sum((y[test] - pred)**2)
+        r2.append(1 - sse / np.sum((y[test] - y[test].mean())**2))
+        mse.append(sse / len(test))
+    return {"r2": np.mean(r2), "mse": np.mean(mse)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--sample", type=int, default=12, help="candidates to check by refitting")
+    args = parser.parse_args()
+
+    df = synthetic_clean(args.rows)
+    start = time.perf_counter()
+    serial = Sweep(df).run(n_jobs=1)
+    t_serial = time.perf_counter() - start
+    start = time.perf_counter()
+    sweep = Sweep(df)
+    table = sweep.run(n_jobs=-1)
+    t_parallel = time.perf_counter() - start
+    pd.testing.assert_frame_equal(serial, table)
+
+    rng = np.random.default_rng(0)
+    sample = table.iloc[rng.choice(len(table), args.sample, replace=False)]
+    start = time.perf_counter()
+    for _, row in sample.iterrows():
+        candidate = {"features": row["features"].split("+"), "transform": row["transform"], "by": row["by"] or None}
+        expected = refit_cv(sweep.df, sweep.fit(candidate)["design"], candidate["by"])
+        np.testing.assert_allclose([row["r2"], row["mse"]], [expected["r2"], expected["mse"]], rtol=1e-8)
+    t_refit = (time.perf_counter() - start) / args.sample
+    print(f"identical CV metrics on {args.sample} sampled candidates")
+
+    print(f"{args.rows} rows, {len(table)} candidates")
+    print(f"refit per fold and group  {t_refit * 1e3:8.1f} ms per candidate,"
+          f" ~{t_refit * len(table):.1f} s for the sweep")
+    print(f"Sweep.run serial          {t_serial * 1e3:8.1f} ms")
+    print(f"Sweep.run parallel        {t_parallel * 1e3:8.1f} ms")
@@ -0,0 +1,21 @@
+""" Synthetic stand-in for the clean joined catalog, for the benches that
+fit models on it (cross_validation.py, least_squares.py, sweep.py).
+
+Columns and units follow the joined schema: M, L and met in log10 of kg,
+W and Fe/H, Teff in K and R in solar radii. L follows R and Teff as
+Stefan-Boltzmann has it, and M is linear in L and met plus noise, with a
+small offset for K stars so that per-spectype fits have something to find.
+"""
+import numpy as np
+import pandas as pd
+
+
+def synthetic_clean(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    spectype = rng.choice(list("AFGKM"), rows, p=[0.02, 0.27, 0.4, 0.26, 0.05])
+    Teff = rng.normal(5500, 800, rows)
+    R = rng.lognormal(0, 0.3, rows)
+    L = 26.5 + 2 * np.log10(R) + 4 * np.log10(Teff / 5772) + rng.normal(0, 0.1, rows)
+    met = rng.normal(-4.5, 0.2, rows)
+    M = 0.2 * L + 0.1 * met + 25.4 + 0.02 * (spectype == "K") + rng.normal(0, 0.03, rows)
+    return pd.DataFrame({"spectype": spectype, "M": M, "L": L, "met": met, "Teff": Teff, "R": R})
@@ -0,0 +1,123 @@
+""" Property check for the log-space unit conversion in
+preprocessor/units.py, followed by its timing against the previous
+exponentiate-multiply-log10 code on a large frame.
+
+    python bench/unit_conversion.py --rows 1000000 --trials 200     (from modeling/)
+
+Every trial draws a random frame with values spread over eight orders of
+magnitude and NaN, zero, negative and infinite entries mixed in. The
+kernels must match the old conversion to within MAX_ULP = 1 ulp of the
+larger term of the log-space sum, with NaN and inf in the same places, and
+leave the input frame untouched.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from astropy.constants import M_sun, L_sun
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from preprocessor.units import GAIA_UNITS, NEA_UNITS, to_log_si
+
+MAX_ULP = 1
+
+
+def legacy_gaia(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    FeH_sun = 10 ** (7.46 - 12)
+    df["mh_gspphot"] = FeH_sun * 10**df["mh_gspphot"].astype(float)
+    df["mass_flame"] = M_sun.value * df["mass_flame"].astype(float)
+    df["lum_flame"] = L_sun.value * df["lum_flame"].astype(float)
+    df["mh_gspphot"] = np.log10(df["mh_gspphot"])
+    df["mass_flame"] = np.log10(df["mass_flame"])
+    df["lum_flame"] = np.log10(df["lum_flame"])
+    return df
+
+
+def legacy_nea(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    FeH_sun = 10 ** (7.46 - 12)
+    df["st_met"] = FeH_sun * 10**df["st_met"].astype(float)
+    df["st_mass"] = M_sun.value * df["st_mass"].astype(float)
+    df["st_lum"] = L_sun.value * 10**df["st_lum"].astype(float)
+    df["st_met"] = np.log10(df["st_met"])
+    df["st_mass"] = np.log10(df["st_mass"])
+    df["st_lum"] = np.log10(df["st_lum"])
+    return df
+
+
+def random_frame(rng: np.random.Generator, rows: int, units: dict) -> pd.DataFrame:
+    data = {}
+    for column, (_, log_input) in units.items():
+        if log_input:
+            values = rng.normal(0, rng.uniform(0.1, 3), rows)
+        else:
+            values = 10 ** rng.uniform(-4, 4, rows)
+        special = rng.random(rows)
+        values[special < 0.02] = np.nan
+        values[(special >= 0.02) & (special < 0.03)] = 0.0
+        values[(special >= 0.03) & (special < 0.04)] *= -1
+        values[(special >= 0.04) & (special < 0.045)] = np.inf
+        data[column] = values
+    data["other"] = np.arange(rows)
+    return pd.DataFrame(data)
+
+
+def ulp_distance(a: np.ndarray, b: np.ndarray, log_unit: float) -> np.ndarray:
+    """ |a - b| in ulp of the largest term of the sum, since a result near
+    zero comes from cancellation between log_unit and the input """
+    finite = np.isfinite(a) & np.isfinite(b)
+    scale = np.maximum(np.maximum(np.abs(a[finite]), np.abs(b[finite])), abs(log_unit))
+    return np.abs(a[finite] - b[finite]) / np.spacing(scale)
+
+
+def check(units: dict, legacy, rng: np.random.Generator, rows: int) -> float:
+    df = random_frame(rng, rows, units)
+    before = df.copy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expected = legacy(df)
+        actual = to_log_si(df, units)
+    pd.testing.assert_frame_equal(df, before)     # Input not mutated
+
+    worst = 0.0
+    for column, (log_unit, _) in units.items():
+        a, b = actual[column].to_numpy(), expected[column].to_numpy()
+        assert a.dtype == np.float64
+        assert np.array_equal(np.isnan(a), np.isnan(b)), column
+        assert np.array_equal(a[np.isinf(a)], b[np.isinf(b)]), column
+        distance = ulp_distance(a, b, log_unit)
+        worst = max(worst, distance.max(initial=0.0))
+        assert worst <= MAX_ULP, f"{column}: {worst} ulp"
+    pd.testing.assert_series_equal(actual["other"], expected["other"])
+    return worst
+
+
+def timed(fn, *args, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--trials", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for name, units, legacy in (("gaia", GAIA_UNITS, legacy_gaia), ("nea", NEA_UNITS, legacy_nea)):
+        worst = max(check(units, legacy, rng, int(rng.integers(1, 5000))) for _ in range(args.trials))
+        print(f"{name}: {args.trials} random frames match, worst difference {worst:.0f} ulp")
+
+    df = random_frame(rng, args.rows, GAIA_UNITS)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # legacy_gaia copies the frame first, as process() mutated its input
+        legacy_s = timed(legacy_gaia, df)
+        kernel_s = timed(to_log_si, df, GAIA_UNITS)
+    print(f"{args.rows} rows: legacy {legacy_s * 1e3:.1f} ms, log-space {kernel_s * 1e3:.1f} ms "
+          f"({legacy_s / kernel_s:.1f}x)")
@@ -0,0 +1,103 @@
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.model_selection import KFold, RepeatedKFold
+
+
+# Metrics over the last axis, so one call scores a whole stack of bootstrap samples
+def _mse(y, pred):
+    return np.mean((y - pred)**2, axis=-1)
+
+def _mae(y, pred):
+    return np.mean(np.abs(y - pred), axis=-1)
+
+def _r2(y, pred):
+    sse = np.sum((y - pred)**2, axis=-1)
+    sst = np.sum((y - np.mean(y, axis=-1, keepdims=True))**2, axis=-1)
+    return 1 - sse / sst
+
+METRICS = {"r2": _r2, "mse": _mse, "mae": _mae}
+
+
+def _fit_fold(model, X: np.ndarray, y: np.ndarray, train: np.ndarray, test: np.ndarray):
+    model = clone(model).fit(X[train], y[train])
+    pred = np.ravel(model.predict(X[test]))
+    return pred, {name: float(metric(y[test], pred)) for name, metric in METRICS.items()}
+
+
+def cross_validate(model, X, y, n_splits: int = 5, n_repeats: int = 1, random_state: int | None = 1,
+                   n_jobs: int | None = None, prefer: str = "threads", n_boot: int = 0, alpha: float = 0.05) -> dict:
+    """ K-fold (optionally repeated) cross-validation that fits every fold once.
+
+    Each fit yields all METRICS and the out-of-fold predictions together;
+    folds run on a joblib pool of n_jobs workers (threads by default, as
+    the fits are NumPy-bound; prefer="processes" for models holding the GIL).
+    X and y are converted to arrays once and shared by every fold.
+
+    With n_repeats=1 the splits are those of KFold(n_splits, shuffle=True,
+    random_state), so the fold scores match cross_val_score on that KFold.
+
+    Returns a dict with per-fold scores ("folds"), their means, out-of-fold
+    predictions and residuals of shape (n_repeats, n_samples) and, when
+    n_boot > 0, percentile bootstrap confidence intervals ("ci") of the
+    pooled out-of-fold metrics, resampled from those residuals without
+    refitting. """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.ravel(np.asarray(y, dtype=np.float64))
+    if n_repeats == 1:
+        cv = KFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+    else:
+        cv = RepeatedKFold(n_splits=n_splits, n_repeats=n_repeats, random_state=random_state)
+    splits = list(cv.split(X))
+
+    fits = Parallel(n_jobs=n_jobs, prefer=prefer)(delayed(_fit_fold)(model, X, y, train, test)
+                                                  for train, test in splits)
+
+    oof = np.empty((n_repeats, len(y)))
+    folds = []
+    for i, ((_, test), (pred, scores)) in enumerate(zip(splits, fits)):
+        repeat, fold = divmod(i, n_splits)
+        oof[repeat, test] = pred
+        folds.append({"repeat": repeat, "fold": fold, "n_test": len(test), **scores})
+
+    result = {
+        "folds": folds,
+        **{name: float(np.mean([f[name] for f in folds])) for name in METRICS},
+        "oof_pred": oof,
+        "residuals": y - oof,
+    }
+    if n_boot:
+        result["ci"] = bootstrap_ci(y, oof, n_boot, alpha, random_state)
+    return result
+
+
+def bootstrap_ci(y: np.ndarray, pred: np.ndarray, n_boot: int = 2000, alpha: float = 0.05,
+                 random_state: int | None = None, max_elements: int = 8_000_000) -> dict:
+    """ Percentile bootstrap intervals of METRICS over resampled rows.
+
+    pred holds one row of predictions per CV repeat; every bootstrap sample
+    scores all repeats on the same resampled rows and averages them. All
+    three metrics, averaged over repeats, are functions of row sums of
+    squared and absolute residuals and of y, so each sample is a vector of
+    resampling counts and a block of samples is one matrix product with
+    the per-row statistics. Blocks hold at most max_elements counts. """
+    rng = np.random.default_rng(random_state)
+    residuals = y - np.atleast_2d(pred)
+    centered = y - y.mean()
+    rows = np.column_stack([np.mean(residuals**2, axis=0), np.mean(np.abs(residuals), axis=0),
+                            centered, centered**2])
+    n = len(y)
+    block = max(1, max_elements // n)
+
+    sums = []
+    for start in range(0, n_boot, block):
+        size = min(block, n_boot - start)
+        idx = rng.integers(0, n, (size, n), dtype=np.int32)
+        idx = (idx + n * np.arange(size)[:, None]).ravel()
+        counts = np.bincount(idx, minlength=size * n).reshape(size, n)
+        sums.append(counts @ rows)
+    sse, sae, sy, syy = np.concatenate(sums).T
+
+    samples = {"r2": 1 - sse / (syy - sy**2 / n), "mse": sse / n, "mae": sae / n}
+    return {name: tuple(float(q) for q in np.quantile(samples[name], [alpha / 2, 1 - alpha / 2]))
+            for name in METRICS}
@@ -0,0 +1,113 @@
+import json
+import datetime
+import sys
+from pathlib import Path
+from typing import Iterable
+import numpy as np
+import pandas as pd
+import sklearn
+from astropy.constants import M_sun, L_sun
+
+FORMAT = "stellar-mass-linear/1"
+# One linear model per segment of the segment_by feature; see piecewise.py
+PIECEWISE_FORMAT = "stellar-mass-piecewise/1"
+# The app's NumPy-only scoring module, held to the same parity as the artifact
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+
+
+def export_model(model, features: list[str], n_samples: int, X: pd.DataFrame | Iterable[pd.DataFrame],
+                 path: str = "model.json", **metadata):
+    """ Writes the fitted linear model as a small JSON artifact that the app
+    can evaluate with NumPy alone, then checks the artifact reproduces
+    model.predict(X). X is a DataFrame or, for models fitted on streamed
+    rows, an iterable of DataFrame chunks such as preprocessor.iter_table;
+    n_samples is the number of rows the model was fitted on.
+
+    A piecewise.PiecewiseModel with more than one segment is written in
+    PIECEWISE_FORMAT: the interior segment edges, then one intercept and
+    one coef row per segment. Models fitted from normal equations also
+    carry the parameters of their prediction intervals ("interval", see
+    least_squares.NormalEquations.interval), per segment if piecewise. """
+    if len(getattr(model, "edges_", ())):
+        params = {
+            "format": PIECEWISE_FORMAT,
+            "features": list(features),
+            "segment_by": model.segment_by,
+            "edges": [float(e) for e in model.edges_],
+            "intercept": [float(i) for i in model.intercept_],
+            "coef": [[float(c) for c in row] for row in model.coef_],
+            "segment_samples": [int(n) for n in model.n_samples_],
+        }
+        if hasattr(model, "intervals_"):
+            # One value (or vector, matrix) per segment under every key but the level
+            params["interval"] = {"level": model.intervals_[0]["level"],
+                                  **{key: [i[key] for i in model.intervals_]
+                                     for key in ("t", "sigma2", "n", "mean", "xtx_inv")}}
+    else:
+        params = {
+            "format": FORMAT,
+            "features": list(features),
+            "intercept": float(np.ravel(model.intercept_)[0]),
+            "coef": [float(c) for c in np.ravel(model.coef_)],
+        }
+        if hasattr(model, "intervals_"):
+            params["interval"] = model.intervals_[0]
+        elif hasattr(model, "interval_"):
+            params["interval"] = model.interval_
+    artifact = {
+        **params,
+        "units": {
+            "target": "log10 kg",
+            "L": "log10 W",
+            "met": "log10 Fe/H",
+            "log_L_sun_W": 26.583,
+            "M_sun_kg": M_sun.value,
+            "L_sun_W": L_sun.value,
+        },
+        "training": {
+            "n_samples": int(n_samples),
+            "sklearn_version": sklearn.__version__,
+            "trained_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            **metadata,
+        },
+    }
+    with open(path, "w") as f:
+        json.dump(artifact, f, indent=2)
+
+    check_parity(path, model, X)
+    return artifact
+
+
+def _app_inference():
+    # Appended, so app modules never shadow the modelling ones
+    if str(APP_DIR) not in sys.path:
+        sys.path.append(str(APP_DIR))
+    import inference
+    return inference
+
+
+def check_parity(path: str, model, X: pd.DataFrame | Iterable[pd.DataFrame], rtol: float = 1e-12):
+    """ Checks that both the artifact's own formula and app/inference.py,
+    loading it as the app does, reproduce model.predict on every row of X """
+    with open(path) as f:
+        artifact = json.load(f)
+    served = _app_inference().model_from_artifact(artifact)
+    for chunk in [X] if isinstance(X, pd.DataFrame) else X:
+        _check_chunk_parity(path, artifact, served, model, chunk, rtol)
+
+
+def _check_chunk_parity(path: str, artifact: dict, served, model, X: pd.DataFrame, rtol: float):
+    X_ordered = X[artifact["features"]].to_numpy(dtype=np.float64)
+    if artifact["format"] == PIECEWISE_FORMAT:
+        by = X_ordered[:, artifact["features"].index(artifact["segment_by"])]
+        segment = np.searchsorted(artifact["edges"], by, side="right")
+        exported = (np.array(artifact["intercept"])[segment]
+                    + np.einsum("ij,ij->i", X_ordered, np.array(artifact["coef"])[segment]))
+    else:
+        exported = artifact["intercept"] + X_ordered @ np.array(artifact["coef"])
+    expected = np.ravel(model.predict(X))
+    np.testing.assert_allclose(exported, expected, rtol=rtol,
+                               err_msg=f"{path} does not reproduce the sklearn predictions")
+    # The app scores a design matrix of [log W, log Fe/H], the order the artifact's features must have
+    np.testing.assert_allclose(served.predict_log(X_ordered), expected, rtol=rtol,
+                               err_msg=f"app/inference.py does not reproduce the sklearn predictions from {path}")
@@ -0,0 +1,245 @@
+from typing import Iterable
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from scipy.stats import t as student_t
+from sklearn.model_selection import KFold
+
+# Coverage of the prediction intervals exported with the models
+INTERVAL_LEVEL = 0.95
+
+
+class NormalEquations:
+    """ Sufficient statistics of an ordinary least squares fit with intercept:
+    row count, feature and target means, and the centered cross-products
+    XᵀX, Xᵀy and yᵀy of the rows seen so far.
+
+    Statistics of disjoint row sets combine exactly with +, and those of a
+    subset are removed with -, using the pairwise update of Chan et al. (as
+    RunningMoments in preprocessor.outliers). Centering keeps the products
+    well conditioned for log-scale features with large offsets, such as L
+    around 26.5, where raw XᵀX loses most of its digits. """
+
+    def __init__(self, n_features: int):
+        self.count = 0
+        self.mean_x = np.zeros(n_features)
+        self.mean_y = 0.0
+        self.xx = np.zeros((n_features, n_features))
+        self.xy = np.zeros(n_features)
+        self.yy = 0.0
+
+    @classmethod
+    def from_arrays(cls, X, y) -> "NormalEquations":
+        X = np.asarray(X, dtype=np.float64)
+        y = np.ravel(np.asarray(y, dtype=np.float64))
+        stats = cls(X.shape[1])
+        if not len(y):
+            return stats
+        stats.count = len(y)
+        stats.mean_x = X.mean(axis=0)
+        stats.mean_y = float(y.mean())
+        Xc = X - stats.mean_x
+        yc = y - stats.mean_y
+        stats.xx = Xc.T @ Xc
+        stats.xy = Xc.T @ yc
+        stats.yy = float(yc @ yc)
+        return stats
+
+    def update(self, X, y) -> "NormalEquations":
+        merged = self + NormalEquations.from_arrays(X, y)
+        self.__dict__.update(merged.__dict__)
+        return self
+
+    def _with_moments(self, count: int, mean_x: np.ndarray, mean_y: float, a: "NormalEquations",
+                      b: "NormalEquations", sign: int) -> "NormalEquations":
+        # Co-moments of a union exceed those of its parts a, b by n_a n_b / n * d d', d = mean_b - mean_a
+        result = NormalEquations(len(mean_x))
+        result.count, result.mean_x, result.mean_y = count, mean_x, mean_y
+        weight = a.count * b.count / (a.count + b.count)
+        dx, dy = b.mean_x - a.mean_x, b.mean_y - a.mean_y
+        result.xx = self.xx + sign * (b.xx + weight * np.outer(dx, dx))
+        result.xy = self.xy + sign * (b.xy + weight * dx * dy)
+        result.yy = self.yy + sign * (b.yy + weight * dy * dy)
+        return result
+
+    def __add__(self, other: "NormalEquations") -> "NormalEquations":
+        if not other.count:
+            return self._copy()
+        if not self.count:
+            return other._copy()
+        count = self.count + other.count
+        mean_x = self.mean_x + (other.mean_x - self.mean_x) * other.count / count
+        mean_y = self.mean_y + (other.mean_y - self.mean_y) * other.count / count
+        return self._with_moments(count, mean_x, mean_y, self, other, 1)
+
+    def __sub__(self, other: "NormalEquations") -> "NormalEquations":
+        """ Statistics of the rows behind self that are not behind other,
+        which must be a subset of them """
+        count = self.count - other.count
+        if not other.count:
+            return self._copy()
+        if count <= 0:
+            return NormalEquations(len(self.mean_x))
+        rest = NormalEquations(len(self.mean_x))
+        rest.count = count
+        rest.mean_x = self.mean_x + (self.mean_x - other.mean_x) * other.count / count
+        rest.mean_y = self.mean_y + (self.mean_y - other.mean_y) * other.count / count
+        return self._with_moments(count, rest.mean_x, rest.mean_y, rest, other, -1)
+
+    def _copy(self) -> "NormalEquations":
+        result = NormalEquations(len(self.mean_x))
+        result.__dict__.update({k: np.copy(v) if isinstance(v, np.ndarray) else v for k, v in self.__dict__.items()})
+        return result
+
+    def subset(self, columns) -> "NormalEquations":
+        """ Statistics of the same rows restricted to the given feature
+        columns, so nested designs share one pass over the data """
+        columns = np.asarray(columns, dtype=np.intp)
+        result = NormalEquations(len(columns))
+        result.count, result.mean_y, result.yy = self.count, self.mean_y, self.yy
+        result.mean_x = self.mean_x[columns]
+        result.xx = self.xx[np.ix_(columns, columns)]
+        result.xy = self.xy[columns]
+        return result
+
+    def vif(self) -> np.ndarray:
+        """ Variance inflation factor of every feature (with intercept), the
+        diagonal of the inverse correlation matrix of the features """
+        scale = np.sqrt(np.diag(self.xx))
+        return np.diag(np.linalg.pinv(self.xx / np.outer(scale, scale)))
+
+    def solve(self) -> tuple[float, np.ndarray]:
+        """ (intercept, coef) minimizing the squared error over the rows seen.
+        Rank-deficient designs get a least-squares solution from lstsq.
+
+        The system is solved in correlation form, with every column scaled
+        to unit norm, since XᵀX squares the condition number of X and
+        features of very different scales (Teff² next to met) would
+        otherwise fall under lstsq's singular value cut-off. """
+        scale = np.sqrt(np.diag(self.xx))
+        scale[scale == 0] = 1.0
+        coef = np.linalg.lstsq(self.xx / np.outer(scale, scale), self.xy / scale, rcond=None)[0] / scale
+        return float(self.mean_y - self.mean_x @ coef), coef
+
+    def xtx_inv(self) -> np.ndarray:
+        """ Inverse of the centered XᵀX, computed in correlation form like solve() """
+        scale = np.sqrt(np.diag(self.xx))
+        scale[scale == 0] = 1.0
+        return np.linalg.pinv(self.xx / np.outer(scale, scale)) / np.outer(scale, scale)
+
+    def interval(self, intercept: float, coef: np.ndarray, level: float = INTERVAL_LEVEL) -> dict:
+        """ Parameters of the prediction interval of the fit (intercept, coef)
+        on these rows, under independent normal errors. For a new x with
+        d = x - mean the interval is
+
+            prediction ± t * sqrt(sigma2 * (1 + 1/n + dᵀ xtx_inv d))
+
+        with sigma2 the residual variance on n - p - 1 degrees of freedom
+        and t the two-sided Student t quantile for level. The intercept's
+        row of the uncentered (XᵀX)⁻¹ folds into the 1/n term. """
+        dof = self.count - len(coef) - 1
+        if dof <= 0:
+            raise ValueError(f"{self.count} rows leave no degrees of freedom for {len(coef)} features")
+        return {
+            "level": level,
+            "t": float(student_t.ppf(0.5 + level / 2, dof)),
+            "sigma2": self.sse(intercept, coef) / dof,
+            "n": int(self.count),
+            "mean": self.mean_x.tolist(),
+            "xtx_inv": self.xtx_inv().tolist(),
+        }
+
+    def sse(self, intercept: float, coef: np.ndarray) -> float:
+        """ Sum of squared residuals of y - intercept - X coef over the rows
+        seen, without revisiting them """
+        offset = self.mean_y - intercept - self.mean_x @ coef
+        return float(self.yy - 2 * coef @ self.xy + coef @ self.xx @ coef + self.count * offset**2)
+
+
+class LeastSquaresModel:
+    """ Linear model solved from NormalEquations, with the coef_, intercept_
+    and predict interface of LinearRegression that export_model relies on """
+
+    def __init__(self, stats: NormalEquations, features: list[str] | None = None):
+        self.stats = stats
+        self.intercept_, self.coef_ = stats.solve()
+        self.interval_ = stats.interval(self.intercept_, self.coef_)
+        self.feature_names_in_ = None if features is None else np.asarray(features, dtype=object)
+
+    def predict(self, X) -> np.ndarray:
+        if isinstance(X, pd.DataFrame) and self.feature_names_in_ is not None:
+            X = X[list(self.feature_names_in_)]
+        return self.intercept_ + np.asarray(X, dtype=np.float64) @ self.coef_
+
+
+def _chunk_statistics(chunk: pd.DataFrame, features: list[str], target: str) -> NormalEquations:
+    return NormalEquations.from_arrays(chunk[features].to_numpy(dtype=np.float64),
+                                       chunk[target].to_numpy(dtype=np.float64))
+
+
+def _chunk_fold_statistics(chunk: pd.DataFrame, features: list[str], target: str, n_splits: int,
+                           seed: list[int]) -> list[NormalEquations]:
+    fold = np.random.default_rng(seed).integers(0, n_splits, len(chunk))
+    return [_chunk_statistics(chunk[fold == k], features, target) for k in range(n_splits)]
+
+
+def fit_chunks(chunks: Iterable[pd.DataFrame], features: list[str], target: str,
+               n_jobs: int | None = None) -> LeastSquaresModel:
+    """ Fits target on features over an iterable of DataFrame chunks, e.g.
+    preprocessor.iter_table(path, chunksize=n), which is consumed lazily.
+
+    Every chunk is reduced to its NormalEquations on a joblib pool of n_jobs
+    workers and the partial statistics are summed, so memory holds a few
+    chunks and one p x p matrix however many rows there are. Rows with a
+    missing feature or target are skipped. """
+    columns = [*features, target]
+    partials = Parallel(n_jobs=n_jobs, prefer="threads")(
+        delayed(_chunk_statistics)(chunk[columns].dropna(), features, target) for chunk in chunks)
+    return LeastSquaresModel(sum(partials, NormalEquations(len(features))), features)
+
+
+def stream_fold_statistics(chunks: Iterable[pd.DataFrame], features: list[str], target: str, n_splits: int = 5,
+                           random_state: int = 1, n_jobs: int | None = None) -> list[NormalEquations]:
+    """ Per-fold NormalEquations over DataFrame chunks in one pass, for
+    cross_validate_statistics; their sum fits the model on all rows.
+
+    Rows are assigned to folds at random, seeded by random_state and the
+    chunk's position, so the folds do not depend on n_jobs and have about
+    equal sizes. Rows with a missing feature or target are skipped. """
+    columns = [*features, target]
+    partials = Parallel(n_jobs=n_jobs, prefer="threads")(
+        delayed(_chunk_fold_statistics)(chunk[columns].dropna(), features, target, n_splits, [random_state, i])
+        for i, chunk in enumerate(chunks))
+    return [sum((p[k] for p in partials), NormalEquations(len(features))) for k in range(n_splits)]
+
+
+def kfold_statistics(X, y, n_splits: int = 5, random_state: int | None = 1) -> list[NormalEquations]:
+    """ NormalEquations of the test rows of every fold of KFold(n_splits,
+    shuffle=True, random_state), the splits cross_validate uses """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.ravel(np.asarray(y, dtype=np.float64))
+    cv = KFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+    return [NormalEquations.from_arrays(X[test], y[test]) for _, test in cv.split(X)]
+
+
+def cross_validate_statistics(folds: list[NormalEquations]) -> dict:
+    """ Exact K-fold CV of least squares from per-fold statistics alone.
+
+    Each fold's training statistics are the total minus that fold, so there
+    is no refit on the data, and its test SSE follows from the fold's own
+    statistics. For the same folds the scores equal those of
+    evaluation.cross_validate with LinearRegression up to rounding. Folds
+    can come from kfold_statistics or be accumulated chunk by chunk for
+    data that does not fit in memory. """
+    total = sum(folds, NormalEquations(len(folds[0].mean_x)))
+    scores = []
+    for fold, test in enumerate(folds):
+        intercept, coef = (total - test).solve()
+        sse = test.sse(intercept, coef)
+        scores.append({"repeat": 0, "fold": fold, "n_test": test.count,
+                       "r2": 1 - sse / test.yy, "mse": sse / test.count})
+    return {
+        "folds": scores,
+        "r2": float(np.mean([s["r2"] for s in scores])),
+        "mse": float(np.mean([s["mse"] for s in scores])),
+    }
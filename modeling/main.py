@@ -1,103 +1,117 @@
 import preprocessor as pp
 import eda
-import pandas as pd
+from export import export_model
+from evaluation import cross_validate
+import piecewise
+from pipeline import Pipeline, Stage, file_digest
 from pathlib import Path
-from sklearn.model_selection import train_test_split, cross_val_score, KFold
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import mean_squared_error, r2_score
 import matplotlib.pyplot as plt
-import numpy as np
-import re
-import joblib
 import mpld3
 
-# Helper function to process ids for cross-referencing
-def clean_ids(ids:np.ndarray):
-    return  [match[0]
-             if isinstance(id, str) 
-             and (match := re.findall(r'\d+', id)) 
-             else np.nan
-             for id in ids]
-
-
+DIR = Path(__file__).resolve().parent
+FEATURES = ["M", "L", "Teff", "R", "met"]
+NEA_CHUNK_ROWS = 100_000
+TRAIN_CHUNK_ROWS = 1_000_000
+CLEAN_TABLE = "preprocessor/output/joined_out.parquet"
 
 #   Units after processing:
 #   M: log10 of mass in kg
 #   L: log10 of lum in W
 #   Met:    log10 of fraction Fe/H
-def main():
-    dir = Path(__file__).resolve().parent
-    nea_path = dir / "preprocessor/input/nea_in.csv"
-
-    nea_raw = pd.read_csv(nea_path, comment="#")
-    nea_proc = pp.NEA.process(nea_raw)
-
+#
+#   Stages receive upstream outputs as arguments and must not modify them,
+#   since the same objects may be handed to several stages.
+def ingest():
+    # Streamed in chunks so memory does not grow with the archive dump
+    return pp.NEA.process_csv(DIR / "preprocessor/input/nea_in.csv", chunksize=NEA_CHUNK_ROWS)
+
+def crossmatch(ingest):
     # Retrieving gaia ids corresponding to tic ids listed in nea
-    nea_ids = nea_proc["tic_id"].to_numpy()
-    nea_ids = np.array(clean_ids(nea_ids))
-
-    gaia_ids = pp.NEA.get_gaia_ids(nea_ids)
+    tic_ids = pp.extract_ids(ingest["tic_id"]).dropna().unique()
+    gaia_ids = pp.NEA.get_gaia_ids(tic_ids)
+    # Both IDs as int64 from here on, whatever type the service returned
+    return gaia_ids.assign(tic_id=pp.extract_ids(gaia_ids["tic_id"]),
+                           gaia_dr3_id=pp.extract_ids(gaia_ids["gaia_dr3_id"]))
 
+def gaia_fetch(crossmatch):
     #Quering Gaia with tic ids
-    gaia_raw = pp.GAIA.get_gaia_from_ids(gaia_ids)
-    gaia_proc = pp.GAIA.process(gaia_raw)
+    gaia_raw = pp.GAIA.get_gaia_from_ids(crossmatch)
+    return pp.GAIA.process(gaia_raw)
 
-    #Join nea with gaia_ids
-    nea_proc["tic_id_clean"] = nea_ids
-    gaia_ids["tic_id"] = gaia_ids["tic_id"].astype(str)
-    nea_proc = nea_proc.merge(gaia_ids, left_on="tic_id_clean", right_on="tic_id")
+def join(ingest, crossmatch, gaia_fetch):
+    #Join nea with gaia_ids on integer TIC IDs
+    nea_proc = ingest.assign(tic_id_clean=pp.extract_ids(ingest["tic_id"]))
+    nea_proc, stats = pp.join_on_ids(nea_proc, crossmatch, "tic_id_clean", "tic_id")
+    print(pp.format_join_stats("NEA x TIC crossmatch", stats))
 
-    gaia_proc = pp.GAIA.normalize_colnames(gaia_proc)
+    gaia_proc = pp.GAIA.normalize_colnames(gaia_fetch)
     nea_proc = pp.NEA.normalize_colnames(nea_proc)
 
     # gaia_proc.to_csv("gaia_out.csv", index=False)
     # nea_proc.to_csv("nea_out.csv", index=False)
 
-    # Compare before final clean
-    joined_df = pp.join_dbs(nea_proc, gaia_proc)
-    eda.compare_distributions(joined_df, features=["M", "L", "Teff", "R", "met"], output_dir="eda/output")
-    eda.check_missing(joined_df)
-    eda.compare_distributions_plotly(joined_df, features=["M", "L", "Teff", "R", "met"], output_dir="eda/output/interactive")
-
-    joined_df = pp.clean_joined(joined_df)
-    joined_df.to_csv("preprocessor/output/joined_out.csv", index=False)
-
-    eda.explore(joined_df, ["M", "met", "L", "Teff", "R"], ["spectype"], output_dir="eda/output", hue_column="spectype")
-    eda.create_graphs(joined_df, ["M", "met", "L", "Teff", "R"], ["spectype"], output_dir="eda/output/interactive", hue_column="spectype")
-
-    #Modelling
-    #joined_path = dir / "preprocessor/output/joined_out.csv"
-    #joined_df = pd.read_csv(joined_path, comment="#")
-    X = joined_df[["L", "met"]] 
-    M = joined_df[["M"]]
-
-    # X_train, X_test, M_train, M_test = train_test_split(X, M, test_size=0.25, random_state=1)
-
-    model = LinearRegression()
-
-    # model.fit(X_train, M_train)
-    # M_pred = model.predict(X_test)
-
-    joblib.dump(model, "linear_model.pkl")
+    return pp.join_dbs(nea_proc, gaia_proc)
 
-    cv = KFold(n_splits=5, shuffle=True, random_state=1)
+def clean(join):
+    joined_df = pp.clean_joined(join.copy())
+    # Parquet for the modelling scripts, Arrow IPC for the app to memory-map
+    path = pp.write_table(joined_df, CLEAN_TABLE, "joined")
+    pp.write_table(joined_df, "preprocessor/output/joined_out.arrow", "joined")
+    # The digest ties stages that stream the table back to these exact rows
+    return {"df": joined_df, "path": str(CLEAN_TABLE), "sha256": file_digest(path)}
 
-    r2 = np.mean(cross_val_score(model, X, M, scoring='r2', cv=cv))
-    mse = -np.mean(cross_val_score(model, X, M, scoring='neg_mean_squared_error', cv=cv))
-    
-    residuals = []
-
-    for train_i, test_i in cv.split(X):
-        X_train, X_test = X.to_numpy()[train_i], X.to_numpy()[test_i]
-        M_train, M_test = M.to_numpy()[train_i], M.to_numpy()[test_i]
-        
-        model.fit(X_train, M_train)
-        M_pred = model.predict(X_test)
-        
-        res = M_test - M_pred
-        residuals.extend(res)
+def run_eda(join, clean):
+    # Compare before final clean
+    eda.compare_distributions(join, features=FEATURES, output_dir="eda/output")
+    eda.check_missing(join)
+    eda.compare_distributions_plotly(join, features=FEATURES, output_dir="eda/output/interactive")
+
+    eda.explore(clean["df"], ["M", "met", "L", "Teff", "R"], ["spectype"], output_dir="eda/output", hue_column="spectype")
+    eda.create_graphs(clean["df"], ["M", "met", "L", "Teff", "R"], ["spectype"], output_dir="eda/output/interactive", hue_column="spectype")
+    return {"output_dir": "eda/output"}
+
+def train(clean):
+    # Every pass below streams the table clean wrote, so the statistics, the exported sample count
+    # and the parity check all cover the rows evaluate cross-validates, as long as it is unchanged
+    path = clean["path"]
+    if file_digest(Path(path)) != clean["sha256"]:
+        raise ValueError(f"{path} changed since the clean stage wrote it; rerun with --from clean")
+    features = ["L", "met"]
+    columns = ["M", *features]
+
+    # One pass gives statistics per luminosity bin and fold, from which every candidate number of
+    # segments is cross-validated exactly and the best one fitted (1 segment: a single model)
+    # Edges from a bounded sample of L over the rows the statistics keep (complete in all columns)
+    edges = piecewise.stream_quantile_edges(
+        (chunk.dropna()["L"] for chunk in pp.iter_table(path, columns=columns, chunksize=TRAIN_CHUNK_ROWS)),
+        piecewise.FINE_BINS)
+    chunks = pp.iter_table(path, columns=columns, chunksize=TRAIN_CHUNK_ROWS)
+    cells = piecewise.stream_segment_statistics(chunks, features, "M", "L", edges, n_splits=5, random_state=1,
+                                                n_jobs=-1)
+    n_segments, cv = piecewise.select_segments(cells, edges)
+    model = piecewise.PiecewiseModel(*piecewise.coarsen(cells, edges, n_segments), features, "L")
+
+    # Rows with a missing value were skipped by the statistics, so the parity check skips them too
+    parity_rows = (chunk.dropna() for chunk in pp.iter_table(path, columns=columns, chunksize=TRAIN_CHUNK_ROWS))
+    export_model(model, features, int(model.n_samples_.sum()), parity_rows, "model.json", data=path)
 
-    residuals = np.array(residuals)
+    print("Coefficient:", model.coef_)
+    print("Intercept:", model.intercept_)
+    print(f"Cross validation by number of luminosity segments (normal equations):\n{cv.to_string(index=False)}")
+    print(f"Exported {n_segments} segment(s)")
+    return model
+
+def evaluate(clean, train):
+    # Scores the exported model: its segmentation is refitted on every fold
+    features = list(train.feature_names_in_)
+    X = clean["df"][features]
+    M = clean["df"][["M"]]
+    estimator = piecewise.PiecewiseRegression(train.edges_, features, train.segment_by)
+
+    # Every fold is fitted once; metrics and out-of-fold residuals come from the same fit
+    cv = cross_validate(estimator, X, M, n_splits=5, random_state=1, n_jobs=-1, n_boot=2000)
+    r2, mse = cv["r2"], cv["mse"]
+    residuals = cv["residuals"][0]
 
     fig = plt.figure(figsize=(8,5))
     plt.hist(residuals, bins=55)
@@ -110,12 +124,60 @@ def main():
         f.write(mpld3.fig_to_html(fig))
     plt.show()
 
-    print("Coefficient:", model.coef_)
-    print("Intercept:", model.intercept_)
-    # print(f"Using regular split: \nMSE={mean_squared_error(M_test, M_pred):.3f} \nr2={r2_score(M_test, M_pred):.3f}")
-    print(f"Cross validation: \nMSE={mse:.3f}, r2={r2:.3f}")
+    print(f"Cross validation ({len(train.edges_) + 1} segment(s)): \nMSE={mse:.3f}, r2={r2:.3f}")
+    print(f"95% bootstrap CI (pooled out-of-fold): MSE={cv['ci']['mse'][0]:.3f}..{cv['ci']['mse'][1]:.3f}, "
+          f"r2={cv['ci']['r2'][0]:.3f}..{cv['ci']['r2'][1]:.3f}")
+    return {"r2": r2, "mse": mse, "residuals": residuals, "folds": cv["folds"], "ci": cv["ci"]}
+
+
+PREPROCESSOR = [DIR / "preprocessor" / f for f in ("preprocessor.py", "crossmatch.py", "gaia_upload.py", "combine_dbs.py",
+                                                    "storage.py", "units.py", "ids.py")]
+EDA = [DIR / "eda" / f for f in ("eda.py", "interactive_graphs.py")]
+
+def build_pipeline() -> Pipeline:
+    return Pipeline([
+        Stage("ingest", ingest, files=[DIR / "preprocessor/input/nea_in.csv"], code=PREPROCESSOR),
+        Stage("crossmatch", crossmatch, ["ingest"], code=PREPROCESSOR),
+        Stage("gaia_fetch", gaia_fetch, ["crossmatch"], code=PREPROCESSOR),
+        Stage("join", join, ["ingest", "crossmatch", "gaia_fetch"], code=PREPROCESSOR),
+        Stage("clean", clean, ["join"], code=PREPROCESSOR),
+        Stage("eda", run_eda, ["join", "clean"], code=EDA),
+        # CLEAN_TABLE is listed so a rewritten table makes train dirty instead of reusing the cached model
+        Stage("train", train, ["clean"], files=[DIR / CLEAN_TABLE],
+              code=[DIR / "export.py", DIR / "least_squares.py", DIR / "piecewise.py"]),
+        Stage("evaluate", evaluate, ["clean", "train"],
+              code=[DIR / "evaluation.py", DIR / "least_squares.py", DIR / "piecewise.py"]),
+    ], store_dir=DIR / ".pipeline")
+
+
+def main(offline: bool = False, refresh: bool = False, start: str | None = None, stop: str | None = None,
+         force: bool = False):
+    # Archive queries are cached on disk; offline runs use the cache only
+    pp.default_cache.offline = offline or pp.default_cache.offline
+    if refresh:
+        print(f"Invalidated {pp.default_cache.invalidate()} cached queries")
+
+    build_pipeline().run(start, stop, force=force)
 
 
 
 if __name__=="__main__":
-    main()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Stellar mass modelling pipeline. Stages whose code and "
+                                     "inputs are unchanged since the last run are loaded from .pipeline/.")
+    parser.add_argument("--offline", action="store_true", help="serve archive queries from the cache only")
+    parser.add_argument("--refresh-cache", action="store_true", help="drop cached archive queries first")
+    parser.add_argument("--stage", help="rerun this stage only, reusing upstream results")
+    parser.add_argument("--from", dest="start", help="first stage of the range to run")
+    parser.add_argument("--to", dest="stop", help="last stage of the range to run")
+    parser.add_argument("--force", action="store_true", help="rerun the selected stages even if up to date")
+    parser.add_argument("--status", action="store_true", help="list stages with their fingerprints and exit")
+    args = parser.parse_args()
+
+    if args.status:
+        for name, fingerprint, clean_ in build_pipeline().status():
+            print(f"{name:<12} {fingerprint}  {'up to date' if clean_ else 'dirty'}")
+    elif args.stage:
+        main(args.offline, args.refresh_cache, args.stage, args.stage, force=True)
+    else:
+        main(args.offline, args.refresh_cache, args.start, args.stop, args.force)
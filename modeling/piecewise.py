@@ -0,0 +1,185 @@
+from typing import Iterable
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.base import BaseEstimator, RegressorMixin
+from least_squares import NormalEquations
+
+# Statistics are kept per fine bin; coarser candidates merge adjacent fine bins
+FINE_BINS = 8
+BIN_CANDIDATES = (1, 2, 4, 8)
+
+
+def quantile_edges(values, n_bins: int = FINE_BINS) -> np.ndarray:
+    """ Interior bin edges at the n_bins-quantiles of values, so every bin
+    holds about the same number of rows. Repeated quantiles collapse. """
+    values = np.asarray(values, dtype=np.float64)
+    return np.unique(np.nanquantile(values, np.arange(1, n_bins) / n_bins))
+
+
+def stream_quantile_edges(chunks: Iterable, n_bins: int = FINE_BINS, sample_size: int = 1_000_000,
+                          random_state: int = 1) -> np.ndarray:
+    """ quantile_edges over values arriving in chunks, in one pass. Only a
+    uniform sample of at most sample_size values is kept (those with the
+    smallest random keys), so the edges are exact up to that many values. """
+    rng = np.random.default_rng(random_state)
+    sample, keys = np.empty(0), np.empty(0)
+    for chunk in chunks:
+        values = np.asarray(chunk, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        sample = np.concatenate([sample, values])
+        keys = np.concatenate([keys, rng.random(len(values))])
+        if len(sample) > sample_size:
+            keep = np.argpartition(keys, sample_size)[:sample_size]
+            sample, keys = sample[keep], keys[keep]
+    return quantile_edges(sample, n_bins)
+
+
+def segment_of(values, edges: np.ndarray) -> np.ndarray:
+    """ Bin index of every value: bin i holds edges[i-1] <= value < edges[i] """
+    return np.searchsorted(edges, values, side="right")
+
+
+def _chunk_segment_statistics(chunk: pd.DataFrame, features: list[str], target: str, segment_by: str,
+                              edges: np.ndarray, n_splits: int, seed: list[int]) -> list[list[NormalEquations]]:
+    # Folds drawn as in least_squares.stream_fold_statistics, so both see the same splits
+    fold = np.random.default_rng(seed).integers(0, n_splits, len(chunk))
+    segment = segment_of(chunk[segment_by].to_numpy(dtype=np.float64), edges)
+    X = chunk[features].to_numpy(dtype=np.float64)
+    y = chunk[target].to_numpy(dtype=np.float64)
+    return [[NormalEquations.from_arrays(X[(segment == s) & (fold == k)], y[(segment == s) & (fold == k)])
+             for k in range(n_splits)] for s in range(len(edges) + 1)]
+
+
+def stream_segment_statistics(chunks: Iterable[pd.DataFrame], features: list[str], target: str, segment_by: str,
+                              edges: np.ndarray, n_splits: int = 5, random_state: int = 1,
+                              n_jobs: int | None = None) -> list[list[NormalEquations]]:
+    """ NormalEquations per (segment, fold) over DataFrame chunks in one pass,
+    with segments cut by edges along the segment_by column.
+
+    Summed over segments these are the per-fold statistics of
+    stream_fold_statistics with the same random_state. """
+    columns = list(dict.fromkeys([*features, target, segment_by]))
+    partials = Parallel(n_jobs=n_jobs, prefer="threads")(
+        delayed(_chunk_segment_statistics)(chunk[columns].dropna(), features, target, segment_by, edges, n_splits,
+                                           [random_state, i])
+        for i, chunk in enumerate(chunks))
+    empty = NormalEquations(len(features))
+    return [[sum((p[s][k] for p in partials), empty) for k in range(n_splits)] for s in range(len(edges) + 1)]
+
+
+def coarsen(cells: list[list[NormalEquations]], edges: np.ndarray, n_bins: int):
+    """ Statistics and edges for n_bins segments made of adjacent fine bins
+    (n_bins must divide the number of fine bins) """
+    step = len(cells) // n_bins
+    if step * n_bins != len(cells):
+        raise ValueError(f"{n_bins} segments do not divide {len(cells)} bins")
+    empty = NormalEquations(len(cells[0][0].mean_x))
+    merged = [[sum((row[k] for row in cells[i:i + step]), empty) for k in range(len(cells[0]))]
+              for i in range(0, len(cells), step)]
+    return merged, np.asarray(edges)[step - 1::step]
+
+
+class PiecewiseModel:
+    """ One least squares fit per segment of the segment_by feature, cut at
+    edges, with the coef_/intercept_/predict interface export_model relies
+    on (coef_ has one row per segment) and prediction interval parameters
+    per segment (intervals_). Segments with fewer than min_rows rows use
+    the fit on all rows. """
+
+    def __init__(self, cells: list[list[NormalEquations]], edges: np.ndarray, features: list[str],
+                 segment_by: str, min_rows: int = 30):
+        empty = NormalEquations(len(features))
+        segments = [sum(row, empty) for row in cells]
+        pooled = sum(segments, empty)
+        used = [s if s.count >= max(min_rows, len(features) + 1) else pooled for s in segments]
+        fits = [s.solve() for s in used]
+        self.edges_ = np.asarray(edges, dtype=np.float64)
+        self.intercept_ = np.array([intercept for intercept, _ in fits])
+        self.coef_ = np.array([coef for _, coef in fits])
+        self.n_samples_ = np.array([s.count for s in segments])
+        self.pooled_ = np.array([s.count < max(min_rows, len(features) + 1) for s in segments])
+        # Pooled segments take the interval of the pooled fit they use
+        self.intervals_ = [s.interval(intercept, coef) for s, (intercept, coef) in zip(used, fits)]
+        self.feature_names_in_ = np.asarray(features, dtype=object)
+        self.segment_by = segment_by
+
+    def predict(self, X) -> np.ndarray:
+        if isinstance(X, pd.DataFrame):
+            X = X[list(self.feature_names_in_)]
+        X = np.asarray(X, dtype=np.float64)
+        segment = segment_of(X[:, list(self.feature_names_in_).index(self.segment_by)], self.edges_)
+        return self.intercept_[segment] + np.einsum("ij,ij->i", X, self.coef_[segment])
+
+
+class PiecewiseRegression(BaseEstimator, RegressorMixin):
+    """ Estimator fitting a PiecewiseModel on fixed edges, so that sklearn
+    tools such as evaluation.cross_validate can refit an exported
+    segmentation on their own rows. X holds the features in order. """
+
+    def __init__(self, edges=(), features=("L", "met"), segment_by: str = "L", min_rows: int = 30):
+        self.edges = edges
+        self.features = features
+        self.segment_by = segment_by
+        self.min_rows = min_rows
+
+    def fit(self, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.ravel(np.asarray(y, dtype=np.float64))
+        edges = np.asarray(self.edges, dtype=np.float64)
+        segment = segment_of(X[:, list(self.features).index(self.segment_by)], edges)
+        cells = [[NormalEquations.from_arrays(X[segment == s], y[segment == s])] for s in range(len(edges) + 1)]
+        self.model_ = PiecewiseModel(cells, edges, list(self.features), self.segment_by, self.min_rows)
+        return self
+
+    def predict(self, X) -> np.ndarray:
+        return self.model_.predict(np.asarray(X, dtype=np.float64))
+
+
+def cross_validate_segments(cells: list[list[NormalEquations]], min_rows: int = 30) -> dict:
+    """ Exact K-fold CV of a piecewise fit from its (segment, fold)
+    statistics, as least_squares.cross_validate_statistics does for one
+    segment. A segment whose training rows are fewer than min_rows is
+    predicted by the pooled fit of that fold's training rows. """
+    n_features = len(cells[0][0].mean_x)
+    empty = NormalEquations(n_features)
+    n_splits = len(cells[0])
+    segments = [sum(row, empty) for row in cells]
+    folds = [sum((row[k] for row in cells), empty) for k in range(n_splits)]
+    total = sum(folds, empty)
+
+    scores = []
+    for k, test in enumerate(folds):
+        pooled = None
+        sse = 0.0
+        for segment, row in zip(segments, cells):
+            if not row[k].count:
+                continue
+            train = segment - row[k]
+            if train.count < max(min_rows, n_features + 1):
+                if pooled is None:
+                    pooled = (total - test).solve()
+                fit = pooled
+            else:
+                fit = train.solve()
+            sse += row[k].sse(*fit)
+        scores.append({"repeat": 0, "fold": k, "n_test": test.count, "r2": 1 - sse / test.yy, "mse": sse / test.count})
+    return {
+        "folds": scores,
+        "r2": float(np.mean([s["r2"] for s in scores])),
+        "mse": float(np.mean([s["mse"] for s in scores])),
+    }
+
+
+def select_segments(cells: list[list[NormalEquations]], edges: np.ndarray, candidates=BIN_CANDIDATES,
+                    min_rows: int = 30) -> tuple[int, pd.DataFrame]:
+    """ The number of segments with the lowest CV MSE among candidates (the
+    fewest on ties), with the CV table of all of them. Candidates that do
+    not divide the fine bins (fewer when quantiles repeat) are skipped. """
+    rows = []
+    for n_bins in [n for n in candidates if len(cells) % n == 0]:
+        merged, _ = coarsen(cells, edges, n_bins)
+        cv = cross_validate_segments(merged, min_rows)
+        rows.append({"segments": n_bins, "r2": cv["r2"], "mse": cv["mse"]})
+    table = pd.DataFrame(rows)
+    return int(table.sort_values(["mse", "segments"]).iloc[0]["segments"]), table
@@ -0,0 +1,123 @@
+import hashlib
+import inspect
+import json
+import pickle
+from pathlib import Path
+
+
+class Stage:
+    """ One step of the pipeline.
+
+    fn receives the outputs of the stages named in inputs as keyword
+    arguments and returns its own output, which must be picklable. files
+    are the on-disk inputs the stage reads; code lists extra source files
+    (modules the stage calls into) whose contents version the stage along
+    with fn's own source. """
+
+    def __init__(self, name: str, fn, inputs: list[str] = (), files: list[str] = (), code: list[str] = ()):
+        self.name = name
+        self.fn = fn
+        self.inputs = list(inputs)
+        self.files = [Path(f) for f in files]
+        self.code = [Path(f) for f in code]
+
+    def code_version(self) -> str:
+        h = hashlib.sha256(inspect.getsource(self.fn).encode("utf-8"))
+        for path in self.code:
+            h.update(path.read_bytes())
+        return h.hexdigest()
+
+
+def file_digest(path: Path) -> str:
+    if not path.exists():
+        return "missing"
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class Pipeline:
+    """ Runs a DAG of stages, caching every stage output under store_dir.
+
+    A stage's fingerprint hashes its code version, the contents of its input
+    files and the fingerprints of its upstream stages, so any change makes
+    that stage and everything downstream dirty. Clean stages are loaded
+    from the store only when a dirty stage needs them. """
+
+    def __init__(self, stages: list[Stage], store_dir: str | Path = ".pipeline"):
+        self.stages = {stage.name: stage for stage in stages}
+        self.order = [stage.name for stage in stages]
+        self.store_dir = Path(store_dir)
+        for stage in stages:
+            unknown = set(stage.inputs) - set(self.order[:self.order.index(stage.name)])
+            if unknown:
+                raise ValueError(f"Stage {stage.name} depends on {unknown}, which must be listed before it")
+        self._fingerprints = {}
+        self._outputs = {}
+
+    def fingerprint(self, name: str) -> str:
+        if name not in self._fingerprints:
+            stage = self.stages[name]
+            h = hashlib.sha256(name.encode("utf-8"))
+            h.update(stage.code_version().encode("utf-8"))
+            for path in stage.files:
+                h.update(f"{path}:{file_digest(path)}".encode("utf-8"))
+            for upstream in stage.inputs:
+                h.update(self.fingerprint(upstream).encode("utf-8"))
+            self._fingerprints[name] = h.hexdigest()[:16]
+        return self._fingerprints[name]
+
+    def _artifact(self, name: str) -> Path:
+        return self.store_dir / name / f"{self.fingerprint(name)}.pkl"
+
+    def is_clean(self, name: str) -> bool:
+        return self._artifact(name).exists()
+
+    def status(self) -> list[tuple[str, str, bool]]:
+        return [(name, self.fingerprint(name), self.is_clean(name)) for name in self.order]
+
+    def output(self, name: str, force: set[str] = frozenset()):
+        """ Output of a stage, recomputing it (and dirty upstream stages) as needed """
+        if name in self._outputs:
+            return self._outputs[name]
+
+        artifact = self._artifact(name)
+        if name not in force and artifact.exists():
+            print(f"[{name}] cached ({self.fingerprint(name)})")
+            with open(artifact, "rb") as f:
+                result = pickle.load(f)
+        else:
+            stage = self.stages[name]
+            kwargs = {upstream: self.output(upstream, force) for upstream in stage.inputs}
+            print(f"[{name}] running ({self.fingerprint(name)})")
+            result = stage.fn(**kwargs)
+
+            artifact.parent.mkdir(parents=True, exist_ok=True)
+            tmp = artifact.with_suffix(".tmp")
+            with open(tmp, "wb") as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            tmp.replace(artifact)
+            (artifact.parent / "latest.json").write_text(json.dumps({"fingerprint": self.fingerprint(name)}))
+
+        self._outputs[name] = result
+        return result
+
+    def run(self, start: str | None = None, stop: str | None = None, force: bool = False):
+        """ Brings stages start..stop (inclusive, in pipeline order) up to date.
+        Stages inside the range are rerun when force is set; stages outside it
+        are only computed if a stage in the range needs them and they are dirty. """
+        first = self.order.index(start) if start else 0
+        last = self.order.index(stop) if stop else len(self.order) - 1
+        if first > last:
+            raise ValueError(f"Stage {start} comes after {stop}")
+        selected = self.order[first:last + 1]
+        forced = set(selected) if force else set()
+
+        for name in selected:
+            if name not in forced and self.is_clean(name):
+                # Loaded later only if a dirty stage needs it
+                print(f"[{name}] up to date ({self.fingerprint(name)})")
+                continue
+            self.output(name, forced)
@@ -1,2 +1,5 @@
 from .preprocessor import GAIA, NEA
-from .combine_dbs import join_dbs, clean_joined
\ No newline at end of file
+from .combine_dbs import join_dbs, clean_joined
+from .query_cache import QueryCache, CacheMiss, default_cache
+from .storage import SCHEMAS, read_table, iter_table, write_table
+from .ids import extract_ids, join_on_ids, format_join_stats
\ No newline at end of file
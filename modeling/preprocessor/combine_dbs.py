@@ -1,37 +1,40 @@
 import pandas as pd
 import numpy as np
-from scipy.stats import zscore
+from .ids import format_join_stats, join_on_ids
+from .outliers import outlier_mask
 
-def remove_outliers(df: pd.DataFrame, columns: list[str] = ["M", "met", "L", "Teff", "R"], threshold: float = 4.0):
-    mask = np.ones(len(df), dtype=bool)
+FEATURES = ["M", "L", "Teff", "R", "met"]
 
-    for column in columns:
-        z_scores = zscore(df[column])
-        mask &= (np.abs(z_scores) < threshold)
+def remove_outliers(df: pd.DataFrame, columns: list[str] = ["M", "met", "L", "Teff", "R"], threshold: float | None = None,
+                    method: str = "zscore", drop_nan: bool = False):
+    # One pass over the feature matrix; see outliers.outlier_mask for the methods
+    mask = outlier_mask(df[columns].to_numpy(dtype=np.float64), method, threshold, drop_nan)
     return df[mask]
 
 def join_dbs(nea_proc: pd.DataFrame, gaia_proc: pd.DataFrame) -> pd.DataFrame:
-    gaia_proc["gaia_dr3_id"] = gaia_proc["gaia_dr3_id"].astype(str)
-    joined_df = nea_proc.merge(gaia_proc, on="gaia_dr3_id", suffixes=("_nea", "_gaia"))
+    # Integer join on the Gaia DR3 ID; neither input is modified
+    joined_df, stats = join_on_ids(nea_proc, gaia_proc, "gaia_dr3_id", suffixes=("_nea", "_gaia"))
+    print(format_join_stats("NEA x Gaia", stats))
     return joined_df
 
 def clean_joined(df: pd.DataFrame) -> pd.DataFrame:
-    df = df[df["evolstage_flame"].between(100, 360)]
-
-    features = ["M", "L", "Teff", "R", "met"]
-    for feature in features:
-        if feature in ["M", "met"]:
-            df[f"{feature}_combined"] = df[f"{feature}_nea"].combine_first(df[f"{feature}_gaia"])
-        else:
-            df[f"{feature}_combined"] = df[f"{feature}_gaia"].combine_first(df[f"{feature}_nea"])
-        df = df.drop(columns=[f"{feature}_nea", f"{feature}_gaia"])        
-    
-    df= df.dropna(subset=[f"{feat}_combined" for feat in features])
-    df = df[df["spectype_gaia"].str.lower() != "unknown"]
-
-    df = df.drop(columns=["spectype_nea", "tic_id_clean", "tic_id_y", "evolstage_flame"])
-
-    df = df.rename(columns={
+    # NEA values win for mass and metallicity, Gaia values for the rest
+    combined = {f"{feature}_combined": df[f"{feature}_nea"].combine_first(df[f"{feature}_gaia"])
+                if feature in ["M", "met"] else
+                df[f"{feature}_gaia"].combine_first(df[f"{feature}_nea"])
+                for feature in FEATURES}
+
+    # All row filters as one mask, so the frame is copied once
+    keep = df["evolstage_flame"].between(100, 360)
+    keep &= pd.DataFrame(combined).notna().all(axis=1)
+    keep &= df["spectype_gaia"].str.lower() != "unknown"
+    keep &= df["tic_id_x"] != "TIC 125843782"   #This star is not in main sequence
+
+    dropped = [f"{feature}_{source}" for feature in FEATURES for source in ("nea", "gaia")]
+    dropped += ["spectype_nea", "tic_id_clean", "tic_id_y", "evolstage_flame"]
+    df = df.drop(columns=dropped).assign(**combined)[keep.to_numpy()]
+
+    return df.rename(columns={
         "tic_id_x": "tic_id",
         "gaia_dr3_id": "gaia_id",
         "spectype_gaia": "spectype",
@@ -41,7 +44,3 @@ def clean_joined(df: pd.DataFrame) -> pd.DataFrame:
         "R_combined": "R",
         "met_combined": "met"
     })
-
-    df = df[df["tic_id"]!="TIC 125843782"] #This star is not in main sequence
-
-    return df
\ No newline at end of file
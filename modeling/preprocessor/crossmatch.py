@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+import pandas as pd
+import pyvo
+
+MAST_TIC_URL = "https://mast.stsci.edu/vo-tap/api/v0.1/tic/"
+
+TIC_QUERY = """
+SELECT id AS tic_id, gaia AS gaia_dr3_id
+FROM dbo.catalogrecord
+WHERE ID IN ({id_list})
+"""
+
+
+class PyvoTAP:
+    """ TAP backend running async jobs through pyvo; point url at any TAP
+    service, including a local stand-in server """
+
+    def __init__(self, url: str = MAST_TIC_URL):
+        self.service = pyvo.dal.TAPService(url)
+
+    def run(self, query: str) -> pd.DataFrame:
+        job = self.service.submit_job(query=query)
+        job.run()
+        job.wait()
+        return job.fetch_result().to_table().to_pandas()
+
+
+class LocalTAP:
+    """ In-process stand-in for the MAST TIC service, answering the TIC→Gaia
+    query from a table with tic_id and gaia_dr3_id columns. fail_first makes
+    the first n calls raise, to exercise retries. """
+
+    def __init__(self, table: pd.DataFrame, fail_first: int = 0, latency: float = 0.0):
+        self.table = table.set_index("tic_id")
+        self.fail_first = fail_first
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def run(self, query: str) -> pd.DataFrame:
+        with self._lock:
+            self.calls += 1
+            fail = self.calls <= self.fail_first
+        time.sleep(self.latency)
+        if fail:
+            raise ConnectionError("Simulated TAP failure")
+
+        ids = [int(x) for x in re.search(r"IN \(([^)]*)\)", query).group(1).split(",") if x.strip()]
+        found = self.table.index.intersection(ids)
+        return self.table.loc[found].reset_index()
+
+
+class RateLimiter:
+    """ Spaces job submissions at least 1/rate seconds apart across threads """
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        time.sleep(max(0.0, start - now))
+
+
+class CrossmatchRunner:
+    """ Runs the TIC→Gaia crossmatch in batches on a bounded thread pool.
+
+    Submissions are rate limited, failed batches are retried with
+    exponential backoff, and with checkpoint_dir set every finished batch is
+    written to disk so an interrupted run resumes with the missing batches
+    only. The checkpoint is tied to the ID list and batch size; a different
+    input starts over. Batches are checkpointed as Parquet, which keeps
+    nullable int64 IDs as they are (a CSV column with a missing Gaia ID
+    would come back as float64 and round 19-digit IDs). """
+
+    def __init__(self, backend=None, batch_size: int = 500, max_workers: int = 4, rate: float = 1.0,
+                 retries: int = 5, backoff: float = 2.0, checkpoint_dir: str | Path | None = None):
+        self.backend = backend if backend is not None else PyvoTAP()
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.limiter = RateLimiter(rate)
+        self.retries = retries
+        self.backoff = backoff
+        self.checkpoint_dir = Path(checkpoint_dir) if checkpoint_dir else None
+
+    def _batch_path(self, i: int) -> Path:
+        return self.checkpoint_dir / f"batch_{i:05d}.parquet"
+
+    def _prepare_checkpoint(self, ids: list[str]) -> None:
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        manifest_path = self.checkpoint_dir / "manifest.json"
+        digest = hashlib.sha256("\n".join(ids).encode()).hexdigest()
+        manifest = {"ids_sha256": digest, "n_ids": len(ids), "batch_size": self.batch_size, "format": "parquet"}
+
+        if manifest_path.exists() and json.loads(manifest_path.read_text()) == manifest:
+            return
+        for old in self.checkpoint_dir.glob("batch_*"):
+            old.unlink()
+        manifest_path.write_text(json.dumps(manifest))
+
+    def _run_batch(self, i: int, batch: list[str]) -> pd.DataFrame:
+        query = TIC_QUERY.format(id_list=", ".join(batch))
+        for attempt in range(self.retries + 1):
+            self.limiter.wait()
+            try:
+                result = self.backend.run(query)
+                break
+            except Exception as e:
+                if attempt == self.retries:
+                    raise RuntimeError(f"Batch {i + 1} failed after {attempt + 1} attempts") from e
+                delay = self.backoff * 2**attempt
+                print(f"Batch {i + 1} failed ({e}), retrying in {delay:.0f}s")
+                time.sleep(delay)
+
+        if self.checkpoint_dir is not None:
+            path = self._batch_path(i)
+            result.to_parquet(path.with_suffix(".tmp"), index=False)
+            os.replace(path.with_suffix(".tmp"), path)
+        return result
+
+    def run(self, ids) -> pd.DataFrame:
+        # Only numeric TIC IDs can go into the IN (...) list
+        ids = [str(x) for x in ids if str(x).isdigit()]
+        batches = [ids[i : i + self.batch_size] for i in range(0, len(ids), self.batch_size)]
+        results = {}
+
+        if self.checkpoint_dir is not None:
+            self._prepare_checkpoint(ids)
+            for i in range(len(batches)):
+                if self._batch_path(i).exists():
+                    results[i] = pd.read_parquet(self._batch_path(i))
+            if results:
+                print(f"Resuming: {len(results)}/{len(batches)} batches already done")
+
+        pending = [i for i in range(len(batches)) if i not in results]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self._run_batch, i, batches[i]): i for i in pending}
+            for future in as_completed(futures):
+                i = futures[future]
+                results[i] = future.result()
+                print(f"Batch {i + 1}/{len(batches)} complete")
+
+        if not results:
+            return pd.DataFrame(columns=["tic_id", "gaia_dr3_id"])
+        return pd.concat([results[i] for i in sorted(results)], ignore_index=True)
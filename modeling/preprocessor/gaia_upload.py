@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+import pandas as pd
+from astropy.table import Table
+from astropy.io.votable import from_table, writeto
+
+GAIA_COLUMNS = ["mass_flame", "mh_gspphot", "lum_flame", "evolstage_flame",
+                "teff_gspphot", "radius_gspphot", "spectraltype_esphs"]
+
+
+class GaiaArchive:
+    """ Runs upload queries as async jobs on the ESA Gaia archive """
+
+    def run_upload(self, query: str, upload: pd.DataFrame, upload_table_name: str) -> pd.DataFrame:
+        from astroquery.gaia import Gaia
+
+        # One VOTable per chunk, so parallel jobs never share an upload file
+        with tempfile.TemporaryDirectory() as tmp:
+            upload_file = os.path.join(tmp, f"{upload_table_name}.xml")
+            writeto(from_table(Table.from_pandas(upload)), upload_file)
+            job = Gaia.launch_job_async(query=query, upload_resource=upload_file,
+                                        upload_table_name=upload_table_name, verbose=False)
+            return job.get_results().to_pandas()
+
+
+class LocalGaiaArchive:
+    """ In-process stand-in for the Gaia archive: answers the upload join from a
+    table with source_id and the astrophysical parameter columns """
+
+    def __init__(self, table: pd.DataFrame, fail_chunks: int = 0, latency: float = 0.0):
+        self.table = table
+        self.fail_chunks = fail_chunks
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def run_upload(self, query: str, upload: pd.DataFrame, upload_table_name: str) -> pd.DataFrame:
+        with self._lock:
+            self.calls += 1
+            fail = self.calls <= self.fail_chunks
+        time.sleep(self.latency)
+        if fail:
+            raise ConnectionError("Simulated archive failure")
+
+        ids = pd.DataFrame({"gaia_dr3_id": upload["gaia_dr3_id"].astype("int64")})
+        joined = ids.merge(self.table, left_on="gaia_dr3_id", right_on="source_id")
+        return joined[["gaia_dr3_id"] + GAIA_COLUMNS]
+
+
+class ChunkedUploader:
+    """ Splits a Gaia ID upload into chunks of at most chunk_size IDs and runs
+    them on a bounded thread pool.
+
+    Every finished chunk is written as its own Parquet part in output_dir,
+    an append-only dataset, and recorded in a manifest, so a failed run
+    resumes with the missing chunks. The combined result is deduplicated by
+    source ID. """
+
+    def __init__(self, archive=None, chunk_size: int = 50_000, max_workers: int = 3,
+                 output_dir: str | Path = "preprocessor/checkpoints/gaia_upload"):
+        self.archive = archive if archive is not None else GaiaArchive()
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.output_dir = Path(output_dir)
+        self._lock = threading.Lock()
+
+    def _part_path(self, i: int) -> Path:
+        return self.output_dir / f"part-{i:05d}.parquet"
+
+    def _load_manifest(self, ids: pd.Series, query: str) -> dict:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        path = self.output_dir / "manifest.json"
+        signature = {"query": " ".join(query.split()), "n_ids": len(ids), "chunk_size": self.chunk_size,
+                     "ids_sha256": hashlib.sha256("\n".join(map(str, ids)).encode()).hexdigest()}
+        if path.exists():
+            manifest = json.loads(path.read_text())
+            if manifest["signature"] == signature:
+                return manifest
+        for old in self.output_dir.glob("part-*.parquet"):
+            old.unlink()
+        manifest = {"signature": signature, "done": []}
+        path.write_text(json.dumps(manifest))
+        return manifest
+
+    def _mark_done(self, manifest: dict, i: int) -> None:
+        with self._lock:
+            manifest["done"].append(i)
+            tmp = self.output_dir / "manifest.tmp"
+            tmp.write_text(json.dumps(manifest))
+            os.replace(tmp, self.output_dir / "manifest.json")
+
+    def _run_chunk(self, i: int, chunk: pd.DataFrame, query: str, upload_table_name: str, manifest: dict) -> int:
+        result = self.archive.run_upload(query, chunk, upload_table_name)
+        result = result.drop_duplicates(subset="gaia_dr3_id")
+        tmp = self._part_path(i).with_suffix(".tmp")
+        result.to_parquet(tmp, index=False)
+        os.replace(tmp, self._part_path(i))
+        # Recorded here rather than by the caller so chunks finishing after
+        # another one failed still count on the next run
+        self._mark_done(manifest, i)
+        return len(result)
+
+    def run(self, gaia_id_df: pd.DataFrame, query: str, upload_table_name: str = "gaia_ids") -> pd.DataFrame:
+        # Only the ID column is used by the query; empty and repeated IDs are dropped before upload.
+        # Sorted so chunk i holds the same IDs whatever order the crossmatch returned them in
+        ids = gaia_id_df["gaia_dr3_id"].dropna().drop_duplicates().sort_values(ignore_index=True)
+        chunks = [ids.iloc[i : i + self.chunk_size].to_frame() for i in range(0, len(ids), self.chunk_size)]
+        manifest = self._load_manifest(ids, query)
+        done = set(manifest["done"])
+        if done:
+            print(f"Resuming: {len(done)}/{len(chunks)} chunks already downloaded")
+
+        pending = [i for i in range(len(chunks)) if i not in done]
+        completed, rows = len(done), 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self._run_chunk, i, chunks[i], query, upload_table_name, manifest): i
+                       for i in pending}
+            for future in as_completed(futures):
+                i = futures[future]
+                n = future.result()
+                completed += 1
+                rows += n
+                print(f"Chunk {i + 1} done: {n} rows ({completed}/{len(chunks)} chunks, {rows} new rows)")
+
+        parts = [pd.read_parquet(self._part_path(i)) for i in range(len(chunks))]
+        if not parts:
+            return pd.DataFrame(columns=["gaia_dr3_id"] + GAIA_COLUMNS)
+        return pd.concat(parts, ignore_index=True).drop_duplicates(subset="gaia_dr3_id", ignore_index=True)
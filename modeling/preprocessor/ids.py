@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+def extract_ids(values) -> pd.Series:
+    """ Last run of digits in every value as nullable int64 ("Int64").
+
+    Accepts catalog labels ("TIC 12345", "Gaia DR3 678" gives 678), bare digit
+    strings and numeric columns. Missing values and values without digits
+    become <NA>. The regex and the parse run in Arrow, so there is no
+    Python-level loop, and 19-digit Gaia IDs never pass through float. """
+    s = pd.Series(values, copy=False)
+    if pd.api.types.is_numeric_dtype(s.dtype):
+        return s.astype("Int64")
+    labels = pa.array(s.astype("string[pyarrow]").array)
+    digits = pc.struct_field(pc.extract_regex(labels, r"(?P<id>\d+)\D*$"), "id")
+    ids = pd.arrays.ArrowExtensionArray(pc.cast(digits, pa.int64()))
+    return pd.Series(ids, index=s.index, name=s.name).astype("Int64")
+
+
+def inner_join_indices(left: pd.Series, right: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """ Row positions (li, ri) of every pair with left[li] == right[ri].
+
+    The right rows are sorted once into runs of equal int64 keys, and a hash
+    index over the distinct keys maps every left key to its run, so each
+    left row costs one lookup. Pairs come in left row order and, within one
+    left row, in right row order. Missing keys never match. """
+    left_valid = left.notna().to_numpy()
+    right_rows = np.flatnonzero(right.notna().to_numpy())
+    left_keys = left.to_numpy(dtype=np.int64, na_value=0)
+    right_keys = right.to_numpy(dtype=np.int64, na_value=0)[right_rows]
+
+    if not len(right_keys):
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+    perm = np.argsort(right_keys, kind="stable")
+    order, sorted_keys = right_rows[perm], right_keys[perm]
+    run_start = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    run_length = np.diff(np.r_[run_start, len(sorted_keys)])
+
+    run = pd.Index(sorted_keys[run_start]).get_indexer(left_keys)
+    found = left_valid & (run >= 0)
+    counts = np.where(found, run_length[run], 0)
+
+    li = np.repeat(np.arange(len(left_keys)), counts)
+    # Offset of every pair inside its left row's run of matches
+    pair_start = np.repeat(np.cumsum(counts) - counts, counts)
+    ri = order[np.repeat(run_start[run[found]], counts[found]) + np.arange(len(li)) - pair_start]
+    return li, ri
+
+
+def join_stats(left: pd.Series, right: pd.Series, li: np.ndarray, ri: np.ndarray) -> dict:
+    """ Cardinality report of a join computed by inner_join_indices """
+    left_pairs = np.bincount(li, minlength=len(left))
+    right_pairs = np.bincount(ri, minlength=len(right))
+    many_left = bool(left.dropna().duplicated().any())
+    many_right = bool(right.dropna().duplicated().any())
+    return {
+        "left_rows": len(left),
+        "right_rows": len(right),
+        "left_missing_keys": int(left.isna().sum()),
+        "right_missing_keys": int(right.isna().sum()),
+        "left_matched": int(np.count_nonzero(left_pairs)),
+        "right_matched": int(np.count_nonzero(right_pairs)),
+        "output_rows": len(li),
+        "max_fanout": int(left_pairs.max(initial=0)),
+        "cardinality": f"{'many' if many_left else 'one'}-to-{'many' if many_right else 'one'}",
+    }
+
+
+def format_join_stats(name: str, stats: dict) -> str:
+    return (f"{name}: {stats['output_rows']} rows ({stats['cardinality']}), "
+            f"left {stats['left_matched']}/{stats['left_rows']} matched ({stats['left_missing_keys']} without key), "
+            f"right {stats['right_matched']}/{stats['right_rows']} matched ({stats['right_missing_keys']} without key), "
+            f"max fan-out {stats['max_fanout']}")
+
+
+def join_on_ids(left: pd.DataFrame, right: pd.DataFrame, left_on: str, right_on: str | None = None,
+                suffixes: tuple[str, str] = ("_x", "_y")) -> tuple[pd.DataFrame, dict]:
+    """ Inner join on integer ID columns, laid out like pd.merge (one key
+    column when both sides use the same name, suffixes on other shared
+    columns, fresh RangeIndex). Keys are parsed with extract_ids, so label
+    and string IDs join correctly with integer ones. Returns the joined
+    frame and its join_stats. """
+    right_on = right_on or left_on
+    left_keys, right_keys = extract_ids(left[left_on]), extract_ids(right[right_on])
+    li, ri = inner_join_indices(left_keys, right_keys)
+
+    left_part = left.iloc[li].reset_index(drop=True)
+    right_part = right.iloc[ri].reset_index(drop=True)
+    left_part[left_on] = left_keys.iloc[li].reset_index(drop=True)
+    if right_on == left_on:
+        right_part = right_part.drop(columns=right_on)
+    else:
+        right_part[right_on] = right_keys.iloc[ri].reset_index(drop=True)
+
+    shared = set(left_part.columns) & set(right_part.columns)
+    left_part = left_part.rename(columns={c: f"{c}{suffixes[0]}" for c in shared})
+    right_part = right_part.rename(columns={c: f"{c}{suffixes[1]}" for c in shared})
+    joined = pd.concat([left_part, right_part], axis=1)
+    return joined, join_stats(left_keys, right_keys, li, ri)
@@ -0,0 +1,111 @@
+from typing import Callable, Iterable, Iterator
+import numpy as np
+import pandas as pd
+
+# Default cut-off per method: |z| for zscore, robust z (scaled MAD) for mad,
+# and Tukey's fence multiplier for iqr
+THRESHOLDS = {"zscore": 4.0, "mad": 4.0, "iqr": 1.5}
+
+# Scales the median absolute deviation to the standard deviation of a normal
+MAD_TO_STD = 1.482602218505602
+
+
+def _bounds(X: np.ndarray, method: str, threshold: float) -> tuple[np.ndarray, np.ndarray]:
+    """ Per-column (low, high) inlier bounds of X, ignoring NaNs """
+    # The NaN-ignoring reductions are several times slower; skip them when possible
+    if np.isnan(X).any():
+        mean, std, median, percentile = np.nanmean, np.nanstd, np.nanmedian, np.nanpercentile
+    else:
+        mean, std, median, percentile = np.mean, np.std, np.median, np.percentile
+
+    if method == "zscore":
+        center, scale = mean(X, axis=0), std(X, axis=0)
+    elif method == "mad":
+        center = median(X, axis=0)
+        scale = MAD_TO_STD * median(np.abs(X - center), axis=0)
+    elif method == "iqr":
+        q1, q3 = percentile(X, [25, 75], axis=0)
+        return q1 - threshold * (q3 - q1), q3 + threshold * (q3 - q1)
+    else:
+        raise ValueError(f"Unknown outlier method {method}")
+    return center - threshold * scale, center + threshold * scale
+
+
+def inlier_mask(X: np.ndarray, bounds: tuple[np.ndarray, np.ndarray], drop_nan: bool = False) -> np.ndarray:
+    """ Rows of X inside the bounds in every column. NaN entries pass unless
+    drop_nan is set; a column with zero spread keeps only its central value. """
+    low, high = bounds
+    with np.errstate(invalid="ignore"):
+        inside = X >= low
+        inside &= X <= high
+    if not drop_nan:
+        inside |= np.isnan(X)
+    return inside.all(axis=1)
+
+
+def outlier_mask(X: np.ndarray, method: str = "zscore", threshold: float | None = None,
+                 drop_nan: bool = False) -> np.ndarray:
+    """ Boolean mask of the rows of the 2D feature matrix X to keep.
+
+    Statistics for all columns come from one vectorized pass over X with
+    NaNs ignored: mean/std for zscore, median/MAD for mad, quartiles for
+    iqr. A row is kept when every feature lies within threshold (see
+    THRESHOLDS for the defaults) of its column's center. """
+    X = np.asarray(X, dtype=np.float64)
+    threshold = THRESHOLDS[method] if threshold is None else threshold
+    with np.errstate(invalid="ignore"):
+        bounds = _bounds(X, method, threshold)
+    return inlier_mask(X, bounds, drop_nan)
+
+
+class RunningMoments:
+    """ Per-column count, mean and sum of squared deviations accumulated
+    over row chunks with Welford's update in its chunked form (Chan et al.),
+    skipping NaNs. Memory is constant in the number of rows. """
+
+    def __init__(self, n_columns: int):
+        self.count = np.zeros(n_columns)
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+
+    def update(self, X: np.ndarray) -> "RunningMoments":
+        X = np.asarray(X, dtype=np.float64)
+        valid = ~np.isnan(X)
+        n = valid.sum(axis=0)
+        safe_n = np.maximum(n, 1)
+        mean = np.where(valid, X, 0.0).sum(axis=0) / safe_n
+        m2 = np.where(valid, (X - mean)**2, 0.0).sum(axis=0)
+
+        total = self.count + n
+        safe_total = np.maximum(total, 1)
+        delta = mean - self.mean
+        self.mean = self.mean + delta * n / safe_total
+        self.m2 = self.m2 + m2 + delta**2 * self.count * n / safe_total
+        self.count = total
+        return self
+
+    @property
+    def std(self) -> np.ndarray:
+        """ Population standard deviation (ddof=0, as scipy.stats.zscore) """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.sqrt(self.m2 / self.count)
+
+    def bounds(self, threshold: float) -> tuple[np.ndarray, np.ndarray]:
+        return self.mean - threshold * self.std, self.mean + threshold * self.std
+
+
+def stream_remove_outliers(read_chunks: Callable[[], Iterable[pd.DataFrame]], columns: list[str],
+                           threshold: float = THRESHOLDS["zscore"], drop_nan: bool = False) -> Iterator[pd.DataFrame]:
+    """ Z-score filter for data read in chunks, e.g. lambda: pd.read_csv(path, chunksize=n).
+
+    The first pass over read_chunks() accumulates RunningMoments, the
+    second yields every chunk without its outlier rows, so only one chunk
+    is in memory at a time. Median and quantile methods need the whole
+    column and have no streaming form here. """
+    moments = RunningMoments(len(columns))
+    for chunk in read_chunks():
+        moments.update(chunk[columns].to_numpy(dtype=np.float64))
+
+    bounds = moments.bounds(threshold)
+    for chunk in read_chunks():
+        yield chunk[inlier_mask(chunk[columns].to_numpy(dtype=np.float64), bounds, drop_nan)]
@@ -1,19 +1,17 @@
 import numpy as np
 import pandas as pd
-import re
 from astroquery.gaia import Gaia
-import pyvo
-from astropy.constants import M_sun, L_sun
-from astropy.table import Table
-from astropy.io.votable import from_table, writeto
-import time
+from .crossmatch import CrossmatchRunner, TIC_QUERY
+from .gaia_upload import ChunkedUploader
+from .query_cache import default_cache
+from .units import GAIA_UNITS, NEA_UNITS, to_log_si
 
 class GAIA:
     def __init__(self):
         pass
 
     @classmethod
-    def get_gaia(cls, query:str):
+    def get_gaia(cls, query:str, cache=default_cache):
         """ documentation: https://gea.esac.esa.int/archive/documentation/GDR3/Gaia_archive/chap_datamodel/sec_dm_astrophysical_parameter_tables/ssec_dm_astrophysical_parameters.html
 
         astro.source_id - ID in Gaia
@@ -23,20 +21,29 @@ class GAIA:
         astro.mass_flame - Mass
         astro.lum_flame - Luminosity
         astro.evolstage_flame - Evolutionary stage (main sequence 100-360)
-        astro.spectraltype_esphs - Spectral type (to classify into mass ranges) """
-        
-        job = Gaia.launch_job_async(query)
-        results = job.get_results()
-        df = results.to_pandas()
+        astro.spectraltype_esphs - Spectral type (to classify into mass ranges)
 
-        return df
+        Results are served from cache (see query_cache.QueryCache) when the
+        same query ran before; pass cache=None to always hit the archive. """
+
+        def run():
+            job = Gaia.launch_job_async(query)
+            results = job.get_results()
+            return results.to_pandas()
+
+        return cache.fetch(query, None, run) if cache is not None else run()
     
     @classmethod
-    def get_gaia_from_ids(cls, gaia_id_df: pd.DataFrame, upload_table_name: str = "gaia_ids", upload_file: str = "preprocessor/gaia_ids.xml"):
-        astropy_table = Table.from_pandas(gaia_id_df)
-        votable = from_table(astropy_table)
-        writeto(votable, upload_file)
-
+    def get_gaia_from_ids(cls, gaia_id_df: pd.DataFrame, upload_table_name: str = "gaia_ids", chunk_size: int = 50_000,
+                          max_workers: int = 3, output_dir: str = "preprocessor/checkpoints/gaia_upload",
+                          archive=None, cache=default_cache):
+        """ Astrophysical parameters for the uploaded Gaia DR3 IDs.
+
+        The upload is split into jobs of at most chunk_size IDs that run in
+        parallel and land in output_dir as Parquet parts, so a failed run
+        resumes with the missing chunks (see gaia_upload.ChunkedUploader).
+        archive defaults to the ESA archive; gaia_upload.LocalGaiaArchive is
+        a local stand-in. """
         query = f"""
         SELECT
             CAST(upload.gaia_dr3_id AS bigint) AS gaia_dr3_id,
@@ -52,24 +59,18 @@ class GAIA:
         ON CAST(upload.gaia_dr3_id AS bigint) = astro.source_id
         """
 
-        job = Gaia.launch_job_async(query = query, upload_resource = upload_file, upload_table_name = upload_table_name, verbose=True)
-        results = job.get_results()
-        df = results.to_pandas()
-        return df
+        def run():
+            uploader = ChunkedUploader(archive, chunk_size=chunk_size, max_workers=max_workers, output_dir=output_dir)
+            return uploader.run(gaia_id_df, query, upload_table_name)
+
+        # Keyed on the uploaded IDs, not on the upload file name
+        ids = gaia_id_df["gaia_dr3_id"].to_numpy()
+        return cache.fetch(query, ids, run) if cache is not None else run()
 
     @classmethod
     def process(cls, df:pd.DataFrame):
-        FeH_sun = 10 ** (7.46 - 12)   # source: https://www.aanda.org/articles/aa/pdf/2021/09/aa40445-21.pdf
-
-        df["mh_gspphot"] = FeH_sun * 10**df["mh_gspphot"].astype(float)
-        df["mass_flame"] = M_sun.value * df["mass_flame"].astype(float)
-        df["lum_flame"] = L_sun.value * df["lum_flame"].astype(float)
-
-        df["mh_gspphot"] = np.log10(df["mh_gspphot"])
-        df["mass_flame"] = np.log10(df["mass_flame"])
-        df["lum_flame"] = np.log10(df["lum_flame"])
-
-        return df
+        # Solar units to log10 SI (see units.py); returns a new frame
+        return to_log_si(df, GAIA_UNITS)
     
     @classmethod
     def normalize_colnames(cls, df:pd.DataFrame):
@@ -91,65 +92,85 @@ class NEA:
     # rehensive survey > individual papers
     #------------------------------------------------------
     @classmethod
-    def _priority(cls, src: str):
-        if pd.isna(src):
-            return 0
-        elif re.match(r"TICv8", src):
-            return 3
-        elif re.match(r"Gaia DR2", src):
-            return 2
-        else:
-            year = re.search(r"\d+", src)
-            return 1 + int(year.group()) / 1e5 if year else 1
+    def _priority(cls, refnames: pd.Series) -> np.ndarray:
+        """ Priority of every row's reference. Refnames repeat heavily, so the
+        string matching runs once per distinct refname and is broadcast back
+        through the factorized codes. """
+        codes, uniques = pd.factorize(refnames)
+        uniques = pd.Series(uniques, dtype=object)
+
+        year = uniques.str.extract(r"(\d+)", expand=False).astype(float).fillna(0)
+        priority = np.select([uniques.str.match(r"TICv8"), uniques.str.match(r"Gaia DR2")],
+                             [3.0, 2.0], default=1 + year / 1e5)
+
+        # Missing refnames get code -1 and the lowest priority
+        return np.append(priority, 0.0)[codes]
 
     @classmethod
-    def get_gaia_ids(cls, ids: np.ndarray, batch_size: int = 500):
-        tap = pyvo.dal.TAPService("https://mast.stsci.edu/vo-tap/api/v0.1/tic/")
-        final_result = []
-
-        for i in range(0, len(ids), batch_size):
-            batch = ids[i : i+batch_size]
-            id_list = ", ".join(str(x) for x in batch)
-
-            query = f"""
-            SELECT id AS tic_id, gaia AS gaia_dr3_id
-            FROM dbo.catalogrecord
-            WHERE ID IN ({id_list})
-            """
-
-            job = tap.submit_job(query=query)
-            job.run()
-            job.wait()
-            query_result = job.fetch_result().to_table().to_pandas()
-            final_result.append(query_result)
-            print(f"Batch {i//batch_size + 1} complete")
-            time.sleep(1)
-        
-        return pd.concat(final_result, ignore_index=True)
+    def get_gaia_ids(cls, ids: np.ndarray, batch_size: int = 500, max_workers: int = 4, rate: float = 1.0,
+                     checkpoint_dir: str | None = "preprocessor/checkpoints/tic_gaia", backend=None,
+                     cache=default_cache):
+        """ Crossmatches TIC IDs to Gaia DR3 IDs on the MAST TIC service.
+
+        Batches run concurrently (at most rate submissions per second), are
+        retried with backoff and checkpointed to checkpoint_dir, so a failed
+        run picks up where it stopped. backend defaults to MAST through pyvo;
+        pass crossmatch.LocalTAP or any object with run(query) -> DataFrame
+        to use another service. The combined result is cached like GAIA.get_gaia. """
+        def run():
+            runner = CrossmatchRunner(backend, batch_size=batch_size, max_workers=max_workers, rate=rate,
+                                      checkpoint_dir=checkpoint_dir)
+            return runner.run(ids)
+
+        return cache.fetch(TIC_QUERY, ids, run) if cache is not None else run()
 
     @classmethod
-    def process(cls, df: pd.DataFrame):
-        FeH_sun = 10 ** (7.46 - 12)
+    def _best_rows(cls, df: pd.DataFrame) -> np.ndarray:
+        """ Positions of the best-reference row of every star, ordered by
+        tic_id with missing IDs last (as a sort would leave them); ties keep
+        the earlier row. Grouping on integer codes keeps idxmax on the fast path. """
+        priority = pd.Series(NEA._priority(df["st_refname"]))
+        stars, ids = pd.factorize(df["tic_id"], sort=True)
+        stars[stars < 0] = len(ids)
+        return priority.groupby(stars).idxmax().to_numpy()
 
+    @classmethod
+    def process(cls, df: pd.DataFrame):
         #ms_idx = df[df["st_spectype"].str.contains(" V", na=False)].index
         #df = df.iloc[ms_idx].dropna()
 
-        df["P"] = df["st_refname"].apply(NEA._priority)
-        df = df.sort_values(["tic_id", "P"], ascending=[True, False])
-        df = df.drop_duplicates(subset="tic_id", keep="first").drop(columns="P")
-
-        # Converting from solar units to SI to prevent 0s
+        df = df.iloc[NEA._best_rows(df)]
         df = df[df["st_metratio"] == "[Fe/H]"]
-        df["st_met"] = FeH_sun * 10**df["st_met"].astype(float)
-        df["st_mass"] = M_sun.value * df["st_mass"].astype(float)
-        df["st_lum"] = L_sun.value * 10**df["st_lum"].astype(float)
-
-        df["st_met"] = np.log10(df["st_met"])
-        df["st_mass"] = np.log10(df["st_mass"])
-        df["st_lum"] = np.log10(df["st_lum"])
+        # Converting from solar units to log10 SI (see units.py)
+        df = to_log_si(df, NEA_UNITS)
         df = df.drop(columns=["st_refname", "st_metratio"])
 
         return df
+
+    @classmethod
+    def process_csv(cls, path, chunksize: int | None = 100_000):
+        """ Reads and processes an NEA stellar-parameter CSV.
+
+        With chunksize set the file is streamed: every chunk is converted to
+        log SI units and merged into the running best row per star, so memory
+        follows the number of distinct stars instead of the file size. The
+        [Fe/H] filter applies to the winning rows at the end, because a star
+        whose best reference is not [Fe/H] is dropped rather than falling back
+        to a worse one. The result equals process(pd.read_csv(path, comment="#")). """
+        if chunksize is None:
+            return NEA.process(pd.read_csv(path, comment="#"))
+
+        best = None
+        for chunk in pd.read_csv(path, comment="#", chunksize=chunksize):
+            chunk = to_log_si(chunk, NEA_UNITS)
+            # Rows kept so far come first, so ties still go to the earlier row
+            merged = chunk if best is None else pd.concat([best, chunk])
+            best = merged.iloc[NEA._best_rows(merged)]
+
+        if best is None:
+            return NEA.process(pd.read_csv(path, comment="#"))
+        best = best[best["st_metratio"] == "[Fe/H]"]
+        return best.drop(columns=["st_refname", "st_metratio"])
     
     @classmethod
     def normalize_colnames(cls, df:pd.DataFrame):
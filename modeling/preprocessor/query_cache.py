@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+import pandas as pd
+
+
+class CacheMiss(LookupError):
+    pass
+
+
+class QueryCache:
+    """ Content-addressed on-disk cache for remote archive queries.
+
+    Entries are keyed on the ADQL text plus the set of uploaded IDs (order
+    and duplicates do not matter) and stored as Parquet with a JSON sidecar
+    holding the query, ID count and creation time. Entries older than ttl
+    seconds are ignored. In offline mode a miss raises CacheMiss instead of
+    reaching the network.
+
+    QUERY_CACHE_OFFLINE=1 and QUERY_CACHE_TTL=<seconds> set the defaults. """
+
+    def __init__(self, directory: str | Path = "preprocessor/cache", ttl: float | None = None,
+                 offline: bool | None = None):
+        self.directory = Path(directory)
+        if ttl is None and os.environ.get("QUERY_CACHE_TTL"):
+            ttl = float(os.environ["QUERY_CACHE_TTL"])
+        self.ttl = ttl
+        self.offline = os.environ.get("QUERY_CACHE_OFFLINE") == "1" if offline is None else offline
+
+    @staticmethod
+    def key(query: str, ids=None) -> str:
+        h = hashlib.sha256(" ".join(query.split()).encode("utf-8"))
+        if ids is not None:
+            h.update(b"\0")
+            h.update("\n".join(sorted({str(x) for x in ids})).encode("utf-8"))
+        return h.hexdigest()
+
+    def _paths(self, key: str):
+        return self.directory / f"{key}.parquet", self.directory / f"{key}.json"
+
+    def get(self, query: str, ids=None) -> pd.DataFrame | None:
+        data_path, meta_path = self._paths(self.key(query, ids))
+        if not data_path.exists() or not meta_path.exists():
+            return None
+        meta = json.loads(meta_path.read_text())
+        if self.ttl is not None and time.time() - meta["created"] > self.ttl:
+            return None
+        return pd.read_parquet(data_path)
+
+    def put(self, query: str, ids, df: pd.DataFrame) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        data_path, meta_path = self._paths(self.key(query, ids))
+        tmp = data_path.with_suffix(".tmp")
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, data_path)
+        meta_path.write_text(json.dumps({
+            "query": query,
+            "n_ids": None if ids is None else len(ids),
+            "rows": len(df),
+            "created": time.time(),
+        }))
+
+    def invalidate(self, query: str | None = None, ids=None) -> int:
+        """ Removes one entry, or every entry when query is None; returns the count """
+        if query is None:
+            keys = [path.stem for path in self.directory.glob("*.json")]
+        else:
+            keys = [self.key(query, ids)]
+        removed = 0
+        for key in keys:
+            data_path, meta_path = self._paths(key)
+            removed += meta_path.exists()
+            data_path.unlink(missing_ok=True)
+            meta_path.unlink(missing_ok=True)
+        return removed
+
+    def fetch(self, query: str, ids, compute) -> pd.DataFrame:
+        """ Cached result of compute() for this query and ID set """
+        cached = self.get(query, ids)
+        if cached is not None:
+            print(f"Query cache hit ({len(cached)} rows)")
+            return cached
+        if self.offline:
+            raise CacheMiss("Query result is not cached and offline mode is on")
+
+        df = compute()
+        self.put(query, ids, df)
+        return df
+
+
+default_cache = QueryCache()
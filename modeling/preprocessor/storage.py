@@ -0,0 +1,109 @@
+import sys
+from typing import Iterator
+from pathlib import Path
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+# Categorical strings such as spectral types are stored dictionary encoded
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+
+#   Units follow the processing steps:
+#   M, L, met:  log10 of kg, W and Fe/H, kept in float64
+#   Teff, R:    K and solar radii, float32 like the Gaia source columns
+SCHEMAS = {
+    "nea": pa.schema([
+        ("tic_id", pa.string()),
+        ("spectype", CATEGORY),
+        ("Teff", pa.float32()),
+        ("R", pa.float32()),
+        ("M", pa.float64()),
+        ("met", pa.float64()),
+        ("L", pa.float64()),
+    ]),
+    "gaia": pa.schema([
+        ("source_id", pa.int64()),
+        ("M", pa.float64()),
+        ("met", pa.float64()),
+        ("L", pa.float64()),
+        ("evolstage_flame", pa.int16()),
+        ("Teff", pa.float32()),
+        ("R", pa.float32()),
+        ("spectype", CATEGORY),
+    ]),
+    "joined": pa.schema([
+        ("tic_id", pa.string()),
+        ("gaia_id", pa.int64()),
+        ("spectype", CATEGORY),
+        ("M", pa.float64()),
+        ("L", pa.float64()),
+        ("Teff", pa.float32()),
+        ("R", pa.float32()),
+        ("met", pa.float64()),
+    ]),
+}
+
+
+def to_table(df: pd.DataFrame, schema: str | pa.Schema) -> pa.Table:
+    """ Arrow table with exactly the columns and types of the schema; IDs
+    held as strings are parsed, so a wrong value fails loudly here """
+    schema = SCHEMAS[schema] if isinstance(schema, str) else schema
+    table = pa.Table.from_pandas(df[schema.names], preserve_index=False)
+    return table.cast(schema)
+
+
+def write_table(df: pd.DataFrame, path: str | Path, schema: str | pa.Schema) -> Path:
+    """ Writes df as Parquet (.parquet, zstd) or as an uncompressed Arrow IPC
+    file (.arrow), the layout readers can memory-map without decoding """
+    path = Path(path)
+    table = to_table(df, schema)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    if path.suffix == ".parquet":
+        pq.write_table(table, tmp, compression="zstd")
+    elif path.suffix == ".arrow":
+        # One record batch, so every column maps to a single contiguous buffer
+        feather.write_feather(table, tmp, compression="uncompressed", chunksize=max(table.num_rows, 1))
+    else:
+        raise ValueError(f"Unsupported table format {path.suffix}")
+    tmp.replace(path)
+    return path
+
+
+def read_table(path: str | Path, columns: list[str] | None = None) -> pd.DataFrame:
+    """ Reads a table written by write_table (or a legacy CSV) into pandas,
+    with dictionary columns as categoricals """
+    path = Path(path)
+    if path.suffix == ".csv":
+        return pd.read_csv(path, usecols=columns, float_precision="round_trip")
+    if path.suffix == ".parquet":
+        table = pq.read_table(path, columns=columns, memory_map=True)
+    else:
+        table = feather.read_table(path, columns=columns, memory_map=True)
+    return table.to_pandas()
+
+
+def iter_table(path: str | Path, columns: list[str] | None = None, chunksize: int = 100_000) -> Iterator[pd.DataFrame]:
+    """ Reads a table like read_table, but yields it in DataFrames of at most
+    chunksize rows, so only one chunk is in memory at a time (Parquet is
+    decoded batch by batch, Arrow IPC is memory-mapped) """
+    path = Path(path)
+    if path.suffix == ".csv":
+        yield from pd.read_csv(path, usecols=columns, float_precision="round_trip", chunksize=chunksize)
+        return
+    if path.suffix == ".parquet":
+        batches = pq.ParquetFile(path, memory_map=True).iter_batches(batch_size=chunksize, columns=columns)
+    else:
+        batches = feather.read_table(path, columns=columns, memory_map=True).to_batches(max_chunksize=chunksize)
+    for batch in batches:
+        yield batch.to_pandas()
+
+
+if __name__ == "__main__":
+    # Converts the CSV outputs of earlier runs: python -m preprocessor.storage preprocessor/output/*.csv
+    for csv_path in map(Path, sys.argv[1:]):
+        schema = csv_path.stem.removesuffix("_out")
+        df = read_table(csv_path)
+        print("Wrote", write_table(df, csv_path.with_suffix(".parquet"), schema))
+        if schema == "joined":
+            print("Wrote", write_table(df, csv_path.with_suffix(".arrow"), schema))
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+from astropy.constants import M_sun, L_sun
+
+# Everything downstream works in log10 of SI units (see main.py), so a
+# conversion from solar units is one addition in log space:
+#   log10(unit * x)     = log10(unit) + log10(x)   for linear inputs
+#   log10(unit * 10**x) = log10(unit) + x          for log inputs
+LOG_M_SUN_KG = float(np.log10(M_sun.value))
+LOG_L_SUN_W = float(np.log10(L_sun.value))
+LOG_FEH_SUN = 7.46 - 12     # source: https://www.aanda.org/articles/aa/pdf/2021/09/aa40445-21.pdf
+
+# column: (log10 of the solar unit, whether the column is already log10)
+GAIA_UNITS = {
+    "mh_gspphot": (LOG_FEH_SUN, True),
+    "mass_flame": (LOG_M_SUN_KG, False),
+    "lum_flame": (LOG_L_SUN_W, False),
+}
+NEA_UNITS = {
+    "st_met": (LOG_FEH_SUN, True),
+    "st_mass": (LOG_M_SUN_KG, False),
+    "st_lum": (LOG_L_SUN_W, True),
+}
+
+
+def log_solar_to_si(values, log_unit: float, log_input: bool) -> np.ndarray:
+    """ log10 of values converted from solar to SI units, as float64.
+
+    The result is computed in a single output buffer: one ufunc for log
+    inputs, a log10 followed by an in-place add for linear ones. values is
+    never written to. Zero and negative linear inputs give -inf and NaN,
+    as the exponentiate-and-log form did. """
+    x = np.asarray(values, dtype=np.float64)
+    if log_input:
+        return np.add(x, log_unit)
+    out = np.log10(x)
+    out += log_unit
+    return out
+
+
+def to_log_si(df: pd.DataFrame, units: dict[str, tuple[float, bool]]) -> pd.DataFrame:
+    """ Copy of df with the columns in units converted by log_solar_to_si;
+    the other columns are shared with df, which is left unchanged """
+    return df.assign(**{column: log_solar_to_si(df[column].to_numpy(dtype=np.float64), log_unit, log_input)
+                        for column, (log_unit, log_input) in units.items()})
@@ -0,0 +1,266 @@
+import itertools
+import json
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from joblib import Parallel, delayed
+from sklearn.model_selection import KFold
+from least_squares import LeastSquaresModel, NormalEquations
+
+DIR = Path(__file__).resolve().parent
+BASE_FEATURES = ["L", "met", "Teff", "R"]
+# Columns stored in linear units (L and met are log10 already, see main.py)
+LINEAR_UNITS = ["Teff", "R"]
+TRANSFORMS = ["linear", "log", "poly2"]
+FORMAT = "stellar-mass-sweep/1"
+
+
+def design(df: pd.DataFrame, transform: str, features: list[str] = BASE_FEATURES) -> tuple[np.ndarray, dict]:
+    """ Design matrix of every term a transform builds from the features,
+    with a spec naming each term and the features it is made of.
+
+    linear  the features as stored
+    log     log10 of the linear-unit features (Teff, R), others as stored
+    poly2   the features plus squares and pairwise products of the
+            features centered on their means (kept in the spec), which
+            keeps the product terms from duplicating the linear ones """
+    base = df[features].to_numpy(dtype=np.float64)
+    terms, columns = [[f] for f in features], list(base.T)
+    spec = {"transform": transform, "features": list(features), "log": [], "center": {}}
+    if transform == "log":
+        spec["log"] = [f for f in features if f in LINEAR_UNITS]
+        columns = [np.log10(c) if f in spec["log"] else c for f, c in zip(features, columns)]
+    elif transform == "poly2":
+        center = base.mean(axis=0)
+        spec["center"] = dict(zip(features, center.tolist()))
+        centered = base - center
+        for i, j in itertools.combinations_with_replacement(range(len(features)), 2):
+            terms.append([features[i], features[j]])
+            columns.append(centered[:, i] * centered[:, j])
+    elif transform != "linear":
+        raise ValueError(f"Unknown transform {transform}")
+    spec["terms"] = terms
+    return np.column_stack(columns), spec
+
+
+def apply_design(df: pd.DataFrame, spec: dict) -> np.ndarray:
+    """ The columns of spec["terms"] for new rows, with the logs and centers
+    fixed at training time """
+    columns = []
+    for term in spec["terms"]:
+        values = [np.log10(df[f].to_numpy(dtype=np.float64)) if f in spec["log"] else
+                  df[f].to_numpy(dtype=np.float64) for f in term]
+        if len(term) == 1:
+            columns.append(values[0])
+        else:
+            columns.append((values[0] - spec["center"][term[0]]) * (values[1] - spec["center"][term[1]]))
+    return np.column_stack(columns)
+
+
+class Sweep:
+    """ Cross-validated comparison of feature subsets, transforms and
+    per-group (e.g. per spectral type) linear models on one table.
+
+    For every (transform, group column) pair the design of all terms over
+    BASE_FEATURES is built once and reduced to NormalEquations per group
+    and KFold fold. A candidate then only selects the columns of its terms
+    from these cached statistics, so scoring it is a few small solves: the
+    CV is exact (training statistics are the total minus the fold, as in
+    least_squares.cross_validate_statistics) and VIFs come from the same
+    statistics. Groups with fewer than min_group_rows training rows use
+    the pooled model. """
+
+    def __init__(self, df: pd.DataFrame, target: str = "M", n_splits: int = 5, random_state: int | None = 1,
+                 min_group_rows: int = 30):
+        self.df = df.dropna(subset=[*BASE_FEATURES, target]).reset_index(drop=True)
+        self.y = self.df[target].to_numpy(dtype=np.float64)
+        self.n_splits = n_splits
+        self.min_group_rows = min_group_rows
+        self.fold = np.empty(len(self.df), dtype=np.intp)
+        cv = KFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+        for k, (_, test) in enumerate(cv.split(self.y)):
+            self.fold[test] = k
+        self._designs = {}
+        self._statistics = {}
+
+    def design(self, transform: str) -> tuple[np.ndarray, dict]:
+        if transform not in self._designs:
+            self._designs[transform] = design(self.df, transform)
+        return self._designs[transform]
+
+    def _groups(self, by: str | None) -> np.ndarray:
+        if by is None:
+            return np.zeros(len(self.df), dtype=np.intp)
+        return pd.factorize(self.df[by].astype("string").fillna("?"), sort=True)[0]
+
+    def statistics(self, transform: str, by: str | None) -> dict:
+        """ NormalEquations per group and fold ("cells", shape groups x
+        folds), per group, per fold and in total, for the full design """
+        key = (transform, by)
+        if key not in self._statistics:
+            X, _ = self.design(transform)
+            groups = self._groups(by)
+            n_groups = groups.max(initial=-1) + 1
+            cells = [[NormalEquations.from_arrays(X[(groups == g) & (self.fold == k)],
+                                                  self.y[(groups == g) & (self.fold == k)])
+                      for k in range(self.n_splits)] for g in range(n_groups)]
+            empty = NormalEquations(X.shape[1])
+            per_group = [sum(row, empty) for row in cells]
+            per_fold = [sum((row[k] for row in cells), empty) for k in range(self.n_splits)]
+            labels = (pd.factorize(self.df[by].astype("string").fillna("?"), sort=True)[1].tolist()
+                      if by is not None else ["all"])
+            self._statistics[key] = {"cells": cells, "group": per_group, "fold": per_fold,
+                                     "total": sum(per_fold, empty), "labels": labels}
+        return self._statistics[key]
+
+    def candidates(self, group_columns: list[str | None] = (None, "spectype")) -> list[dict]:
+        """ Every non-empty subset of BASE_FEATURES with every transform and
+        grouping; log candidates without a linear-unit feature are skipped
+        as they repeat the linear ones """
+        result = []
+        for size in range(1, len(BASE_FEATURES) + 1):
+            for features in itertools.combinations(BASE_FEATURES, size):
+                for transform in TRANSFORMS:
+                    if transform == "log" and not set(features) & set(LINEAR_UNITS):
+                        continue
+                    for by in group_columns:
+                        result.append({"features": list(features), "transform": transform, "by": by})
+        return result
+
+    def columns(self, candidate: dict) -> list[int]:
+        _, spec = self.design(candidate["transform"])
+        return [i for i, term in enumerate(spec["terms"]) if set(term) <= set(candidate["features"])]
+
+    def _train(self, stats: dict, columns: list[int], group: int, fold: int | None) -> NormalEquations:
+        # Group statistics without the held-out fold, or the pooled ones for small groups
+        train = stats["group"][group] - stats["cells"][group][fold] if fold is not None else stats["group"][group]
+        if train.count < max(self.min_group_rows, len(columns) + 1):
+            train = stats["total"] - stats["fold"][fold] if fold is not None else stats["total"]
+        return train.subset(columns)
+
+    def evaluate(self, candidate: dict) -> dict:
+        stats = self.statistics(candidate["transform"], candidate["by"])
+        columns = self.columns(candidate)
+        r2, mse = [], []
+        for k in range(self.n_splits):
+            sse = 0.0
+            for g, row in enumerate(stats["cells"]):
+                if row[k].count:
+                    sse += row[k].subset(columns).sse(*self._train(stats, columns, g, k).solve())
+            test = stats["fold"][k]
+            r2.append(1 - sse / test.yy)
+            mse.append(sse / test.count)
+
+        own = [s.count >= max(self.min_group_rows, len(columns) + 1) for s in stats["group"]]
+        vif = stats["total"].subset(columns).vif()
+        return {
+            "features": "+".join(candidate["features"]),
+            "transform": candidate["transform"],
+            "by": candidate["by"] or "",
+            "n_terms": len(columns),
+            "n_models": sum(own) + (not all(own)),
+            "r2": float(np.mean(r2)),
+            "r2_std": float(np.std(r2)),
+            "mse": float(np.mean(mse)),
+            "max_vif": float(vif.max()),
+            "servable": candidate["by"] is None and [self.design(candidate["transform"])[1]["terms"][c]
+                                                    for c in columns] == [["L"], ["met"]],
+        }
+
+    def run(self, candidates: list[dict] | None = None, n_jobs: int | None = None,
+            prefer: str = "threads") -> pd.DataFrame:
+        """ Scores all candidates on a joblib pool of n_jobs workers and returns
+        the table sorted by CV MSE. The cached statistics are built first, one
+        (transform, grouping) per task, and shared by the candidate tasks. """
+        candidates = self.candidates() if candidates is None else candidates
+        for transform in {c["transform"] for c in candidates}:
+            self.design(transform)
+        keys = sorted({(c["transform"], c["by"]) for c in candidates}, key=str)
+        missing = [key for key in keys if key not in self._statistics]
+        built = Parallel(n_jobs=n_jobs, prefer=prefer)(delayed(self.statistics)(*key) for key in missing)
+        self._statistics.update(zip(missing, built))
+
+        rows = Parallel(n_jobs=n_jobs, prefer=prefer)(delayed(self.evaluate)(c) for c in candidates)
+        return pd.DataFrame(rows).sort_values(["mse", "n_terms"], ignore_index=True)
+
+    def fit(self, candidate: dict) -> dict:
+        """ Coefficients of a candidate fitted on all rows, per group, with its
+        design spec: everything needed to evaluate it on new rows """
+        stats = self.statistics(candidate["transform"], candidate["by"])
+        columns = self.columns(candidate)
+        _, spec = self.design(candidate["transform"])
+        features = candidate["features"]
+        models = {}
+        for g, label in enumerate(stats["labels"]):
+            intercept, coef = self._train(stats, columns, g, None).solve()
+            models[label] = {"intercept": intercept, "coef": coef.tolist(),
+                             "n_samples": int(stats["group"][g].count),
+                             "pooled": bool(stats["group"][g].count < max(self.min_group_rows, len(columns) + 1))}
+        return {
+            "format": FORMAT,
+            "features": features,
+            "by": candidate["by"],
+            "design": {
+                "transform": spec["transform"],
+                "features": features,
+                "log": [f for f in spec["log"] if f in features],
+                "center": {f: c for f, c in spec["center"].items() if f in features},
+                "terms": [spec["terms"][c] for c in columns],
+            },
+            "models": models,
+        }
+
+
+def pick_winner(table: pd.DataFrame, max_vif: float = 10.0, servable_only: bool = False) -> pd.Series:
+    """ Lowest CV MSE among candidates whose terms all have VIF <= max_vif """
+    eligible = table[table["max_vif"] <= max_vif]
+    if servable_only:
+        eligible = eligible[eligible["servable"]]
+    if eligible.empty:
+        raise ValueError(f"No candidate with max VIF <= {max_vif}")
+    return eligible.iloc[0]
+
+
+def as_candidate(row: pd.Series) -> dict:
+    return {"features": row["features"].split("+"), "transform": row["transform"], "by": row["by"] or None}
+
+
+if __name__ == "__main__":
+    import argparse
+    import preprocessor as pp
+    from export import export_model
+
+    parser = argparse.ArgumentParser(description="Cross-validates every feature subset, transform and "
+                                     "per-group model and reports CV metrics with VIFs in one table.")
+    parser.add_argument("--data", default=str(DIR / "preprocessor/output/joined_out.parquet"))
+    parser.add_argument("--jobs", type=int, default=-1, help="parallel workers (joblib n_jobs)")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--max-vif", type=float, default=10.0, help="exclude candidates above this VIF")
+    parser.add_argument("--out", default="sweep.csv", help="where to write the results table")
+    parser.add_argument("--winner", default="sweep_winner.json", help="where to write the winning model")
+    parser.add_argument("--export", action="store_true",
+                        help="also export the best candidate the app can serve to model.json")
+    args = parser.parse_args()
+
+    sweep = Sweep(pp.read_table(args.data), n_splits=args.folds)
+    table = sweep.run(n_jobs=args.jobs)
+    table.to_csv(args.out, index=False)
+    with pd.option_context("display.max_rows", 20, "display.width", 120):
+        print(table)
+
+    winner = pick_winner(table, args.max_vif)
+    artifact = sweep.fit(as_candidate(winner))
+    artifact["cv"] = {"r2": winner["r2"], "mse": winner["mse"], "folds": args.folds}
+    with open(args.winner, "w") as f:
+        json.dump(artifact, f, indent=2)
+    print(f"Winner: {winner['features']} ({winner['transform']}{', by ' + winner['by'] if winner['by'] else ''}),"
+          f" MSE={winner['mse']:.5f}, r2={winner['r2']:.4f}, written to {args.winner}")
+
+    if args.export:
+        servable = pick_winner(table, args.max_vif, servable_only=True)
+        candidate = as_candidate(servable)
+        stats = sweep.statistics(candidate["transform"], candidate["by"])["total"]
+        model = LeastSquaresModel(stats.subset(sweep.columns(candidate)), candidate["features"])
+        export_model(model, candidate["features"], stats.count, sweep.df[candidate["features"]], "model.json",
+                     data=args.data, sweep=args.out)
+        print(f"Exported {servable['features']} to model.json")
@@ -4,7 +4,7 @@ from statsmodels.api import add_constant
 from pathlib import Path
 
 dir = Path(__file__).resolve().parent
-df = add_constant(pd.read_csv(dir / "preprocessor/output/joined_out.csv")[["L", "met"]])
+df = add_constant(pd.read_parquet(dir / "preprocessor/output/joined_out.parquet", columns=["L", "met"]))
 
 vif_df = pd.DataFrame()
 vif_df["Pred"] = ["intercept", "L", "met"]